@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import argparse
+import json
+import platform
+import subprocess
+from importlib import import_module
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6 import __version__ as pyside_version
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# benchmark modules and the arguments of a quick run, the full run uses their defaults
+SUITE: Dict[str, Dict] = {
+    "startup": {"repeat": 2},
+    "capture": {"layouts": ["2x1080p", "3x4k"], "repeat": 3},
+    "render": {"resolutions": ["1080p", "4k"], "steps": 50},
+    "imaging": {"resolutions": ["1080p"], "repeat": 3},
+    "preview": {"resolutions": ["1080p", "4k"], "repeat": 3},
+    "decode": {"resolutions": ["crop", "1080p"], "repeat": 1},
+    "decoders": {"per_category": 4},
+    "generate": {"sizes": [400], "repeat": 3},
+    "encode": {"resolutions": ["1080p"], "repeat": 1},
+}
+
+# fields compared against the baseline, every other scalar field identifies the measurement
+LOWER_IS_BETTER: Tuple[str, ...] = ("ms", "bytes", "bytes_copied")
+HIGHER_IS_BETTER: Tuple[str, ...] = ("fps", "found", "hits")
+INFORMATIONAL: Tuple[str, ...] = ("ratio", "megapixels", "frames", "runs", "cached")
+
+def direction(field: str) -> int:
+    if field in LOWER_IS_BETTER or field.endswith("_ms"):
+        return -1
+    if field in HIGHER_IS_BETTER:
+        return 1
+    return 0
+
+def identity(result: Dict) -> Tuple:
+    return tuple(sorted(
+        (key, value) for key, value in result.items()
+        if isinstance(value, (str, int, float, bool)) and not direction(key) and key not in INFORMATIONAL
+    ))
+
+def metadata() -> Dict:
+    try:
+        commit: str = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=ROOT).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+        
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pyside": pyside_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "qpa": os.environ.get("QT_QPA_PLATFORM"),
+    }
+
+def child(name: str, quick: bool) -> None:
+    # runs a single benchmark in a fresh interpreter and prints its results as JSON
+    from PySide6.QtWidgets import QApplication
+    # created first, some benchmarks would otherwise create a QGuiApplication without widgets
+    app: QApplication = QApplication.instance() or QApplication([])
+    
+    module = import_module(f"benchmarks.{name}")
+    print(json.dumps(module.run(**(SUITE[name] if quick else {}))))
+
+def run(names: List[str] = None, quick: bool = False) -> List[Dict]:
+    results: List[Dict] = []
+    
+    # one process per benchmark, widgets and caches left behind by one must not skew or crash the next
+    for name in names or SUITE:
+        print(f"running {name}...", file=sys.stderr)
+        command: List[str] = [sys.executable, "-m", "benchmarks", "--child", name] + (["--quick"] if quick else [])
+        output: str = subprocess.run(command, cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True).stdout
+        results.extend(json.loads(output.strip().splitlines()[-1]))
+        
+    return results
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float, floor: float = 0.5) -> List[Dict]:
+    previous: Dict[Tuple, Dict] = {identity(result): result for result in baseline}
+    changes: List[Dict] = []
+    
+    for result in results:
+        old: Dict = previous.get(identity(result))
+        if old is None:
+            continue
+            
+        for field, value in result.items():
+            sign: int = direction(field)
+            if not sign or not isinstance(value, (int, float)) or not isinstance(old.get(field), (int, float)):
+                continue
+                
+            before: float = old[field]
+            change: float = (value - before) / before if before else 0.0
+            # differences below the floor are noise for timings in the microsecond range
+            noticeable: bool = abs(value - before) >= (floor if field.endswith("ms") else 0)
+            changes.append({
+                "benchmark": result["benchmark"],
+                "case": {key: value for key, value in identity(result) if key != "benchmark"},
+                "field": field,
+                "baseline": before,
+                "current": value,
+                "change": round(change, 4),
+                "regression": noticeable and change * sign < -threshold,
+            })
+            
+    return changes
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the offscreen benchmark suite and compare it against a baseline.")
+    parser.add_argument("names", nargs="*", metavar="name", help=f"benchmarks to run: {', '.join(SUITE)} (default: all)")
+    parser.add_argument("-q", "--quick", action="store_true", help="fewer resolutions and repetitions")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("-b", "--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1, help="relative change counted as a regression (default: 0.1)")
+    parser.add_argument("--child", choices=list(SUITE), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    unknown: List[str] = [name for name in args.names if name not in SUITE]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)} (choose from {', '.join(SUITE)})")
+        
+    if args.child:
+        child(args.child, args.quick)
+        return 0
+        
+    document: Dict = {"meta": metadata(), "results": run(args.names, args.quick)}
+    
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as f:
+            baseline: Dict = json.load(f)
+        document["baseline"] = baseline.get("meta")
+        document["changes"] = compare(document["results"], baseline.get("results", []), args.threshold)
+        
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(document, f, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+        
+    regressions: List[Dict] = [change for change in document.get("changes", []) if change["regression"]]
+    for change in regressions:
+        case: str = " ".join(f"{key}={value}" for key, value in change["case"].items())
+        print(f"regression {change['benchmark']} {case}: {change['field']} {change['baseline']} -> {change['current']} ({change['change']:+.1%})", file=sys.stderr)
+        
+    if args.baseline:
+        print(f"{len(document['changes'])} measurements compared, {len(regressions)} regressions", file=sys.stderr)
+        
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import os
+import time
+import argparse
+import json
+import statistics
+from typing import Dict, List
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QRect
+from PySide6.QtGui import QGuiApplication, QScreen
+
+from screenshot.backends import BACKENDS, CaptureBackend, SyntheticScreen
+
+# monitor arrangements, the screens are placed next to each other
+LAYOUTS: Dict[str, List[QRect]] = {
+    "1x1080p": [QRect(0, 0, 1920, 1080)],
+    "2x1080p": [QRect(0, 0, 1920, 1080), QRect(1920, 0, 1920, 1080)],
+    "1080p+4k": [QRect(0, 0, 1920, 1080), QRect(1920, -540, 3840, 2160)],
+    "3x4k": [QRect(0, 0, 3840, 2160), QRect(3840, 0, 3840, 2160), QRect(7680, 0, 3840, 2160)],
+}
+
+def measure(backend: CaptureBackend, screens: List[QScreen], repeat: int) -> Dict:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        image = backend.grab(screens)
+        timings.append(time.perf_counter() - start)
+        
+    return {
+        "ms": round(statistics.median(timings) * 1000, 3),
+        "megapixels": round(image.width() * image.height() / 1e6, 2),
+    }
+
+def run(layouts: List[str] = None, backends: List[str] = None, repeat: int = 5) -> List[Dict]:
+    app = QGuiApplication.instance() or QGuiApplication([])
+    results: List[Dict] = []
+    
+    names: List[str] = backends or [name for name, backend in BACKENDS.items() if backend.available()]
+    for name in names:
+        backend: CaptureBackend = BACKENDS[name]()
+        
+        # the screens actually attached, every backend that is available can grab them
+        results.append({"benchmark": "capture.grab", "backend": name, "layout": "live", **measure(backend, QGuiApplication.screens(), repeat)})
+        
+        # synthetic layouts only exercise the backends that accept stand-in screens
+        if name in ("qt", "synthetic"):
+            for layout in layouts or LAYOUTS:
+                screens: List[SyntheticScreen] = [SyntheticScreen(rect, name=f"screen {index}") for index, rect in enumerate(LAYOUTS[layout], 1)]
+                results.append({"benchmark": "capture.grab", "backend": name, "layout": layout, **measure(backend, screens, repeat)})
+                
+        backend.close()
+        
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.capture", description="Capture latency per backend and monitor layout.")
+    parser.add_argument("-l", "--layout", action="append", choices=list(LAYOUTS), help="synthetic layouts to run (default: all)")
+    parser.add_argument("-b", "--backend", action="append", choices=list(BACKENDS), help="backends to run (default: all available)")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="repetitions per measurement, the median is reported")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.layout, args.backend, args.repeat)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        print(f"{result['backend']:>9} {result['layout']:>9}: {result['ms']:9.1f} ms {result['megapixels']:7.2f} MP")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import time
+import argparse
+import json
+import statistics
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QEventLoop, QPoint
+from PySide6.QtGui import QColor, QImage, QPainter
+from PySide6.QtWidgets import QApplication
+import segno
+
+from utils.imaging import pil_to_qimage
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "crop": (400, 400),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+def synthetic_screen(width: int, height: int, codes: int) -> QImage:
+    # codes spread over a light desktop, each one readable at screen size
+    image: QImage = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(240, 240, 240))
+    
+    painter: QPainter = QPainter(image)
+    columns: int = max(1, min(codes, width // 400))
+    for index in range(codes):
+        code: QImage = pil_to_qimage(segno.make_qr(f"https://example.com/{index}").to_pil(scale=6, border=4).convert("RGB"))
+        cell_width: int = width // columns
+        rows: int = (codes + columns - 1) // columns
+        cell_height: int = height // rows
+        x: int = (index % columns) * cell_width + max(cell_width - code.width(), 0) // 2
+        y: int = (index // columns) * cell_height + max(cell_height - code.height(), 0) // 2
+        painter.drawImage(QPoint(x, y), code)
+    painter.end()
+    
+    return image
+
+def run(resolutions: List[str] = None, codes: List[int] = None, repeat: int = 3) -> List[Dict]:
+    app: QApplication = QApplication.instance() or QApplication([])
+    
+    from qrcode.reader import QRCodeReaderMenu
+    reader: QRCodeReaderMenu = QRCodeReaderMenu()
+    results: List[Dict] = []
+    
+    # the selection is decoded in a worker process, a decode ends when the reader got its result
+    done: List[bool] = []
+    reader.decode_runner.finished.connect(lambda *_: done.append(True))
+    reader.decode_runner.failed.connect(lambda *_: done.append(True))
+    
+    def decode(image: QImage, timeout: float = 60.0) -> None:
+        done.clear()
+        reader.update_qr_code(image)
+        
+        deadline: float = time.perf_counter() + timeout
+        while not done and time.perf_counter() < deadline:
+            app.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents, 50)
+            
+    # the first task also waits for the worker to start, which is not part of a decode
+    decode(synthetic_screen(*RESOLUTIONS["crop"], 1))
+    
+    for name in resolutions or RESOLUTIONS:
+        width, height = RESOLUTIONS[name]
+        
+        for count in codes or [1, 4]:
+            # a crop only ever holds a single code
+            if name == "crop" and count > 1:
+                continue
+                
+            image: QImage = synthetic_screen(width, height, count)
+            
+            timings: List[float] = []
+            for _ in range(repeat):
+                start: float = time.perf_counter()
+                decode(image)
+                timings.append(time.perf_counter() - start)
+                
+            results.append({
+                "benchmark": "decode.update_qr_code",
+                "resolution": name,
+                "codes": count,
+                "found": len(reader.codes),
+                "ms": round(statistics.median(timings) * 1000, 3),
+            })
+            
+    reader.decode_runner.shutdown()
+    
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.decode", description="Time from QRCodeReaderMenu.update_qr_code until the codes are shown, on synthetic screens with one or more codes.")
+    parser.add_argument("-r", "--resolution", action="append", choices=list(RESOLUTIONS), help="resolutions to run (default: all)")
+    parser.add_argument("-c", "--codes", type=int, action="append", help="codes per image (default: 1 and 4)")
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="repetitions per case, the median is reported")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.resolution, args.codes, args.repeat)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        print(f"{result['resolution']:>6} {result['codes']:>2} codes: {result['ms']:9.1f} ms, {result['found']} found")
+
+if __name__ == "__main__":
+    main()
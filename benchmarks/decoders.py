@@ -0,0 +1,211 @@
+import time
+import argparse
+import json
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+import segno
+
+from utils import DECODERS
+from utils.decoder import CachedDecoder, CascadeDecoder, DecodeCache, QRCodeDecoder
+
+PAYLOADS: List[str] = [
+    "https://example.com/{index}",
+    "WIFI:T:WPA;S:office-{index};P:correct horse battery staple;;",
+    "BEGIN:VCARD\nVERSION:3.0\nN:Doe;Jane\nTEL:+49 30 {index:07d}\nEND:VCARD",
+    "order {index} " + "x" * 60,
+]
+
+CATEGORIES: Tuple[str, ...] = ("clean", "small", "tiny", "low_contrast", "inverted", "rotated", "noisy", "shadow", "empty")
+
+def render(text: str, scale: int, border: int = 4) -> np.ndarray:
+    return np.array(segno.make_qr(text).to_pil(scale=scale, border=border).convert("L"))
+
+def place(code: np.ndarray, padding: int, background: int = 240) -> np.ndarray:
+    height, width = code.shape
+    canvas: np.ndarray = np.full((height + 2 * padding, width + 2 * padding), background, dtype=np.uint8)
+    canvas[padding:padding + height, padding:padding + width] = code
+    
+    return canvas
+
+def sample(category: str, text: str, rng: np.random.Generator) -> np.ndarray:
+    if category == "clean":
+        return place(render(text, 6), 40)
+        
+    if category == "small":
+        return place(render(text, 2), 20)
+        
+    if category == "tiny":
+        # one pixel per module, as a code seen from across a zoomed out page
+        return place(render(text, 1, border=2), 4)
+        
+    if category == "low_contrast":
+        code: np.ndarray = render(text, 4)
+        return place((code.astype(np.float32) * 0.12 + 110).astype(np.uint8), 30, background=140)
+        
+    if category == "inverted":
+        return cv2.bitwise_not(place(render(text, 4), 30))
+        
+    if category == "rotated":
+        image: np.ndarray = place(render(text, 4), 80)
+        height, width = image.shape
+        matrix: np.ndarray = cv2.getRotationMatrix2D((width / 2, height / 2), float(rng.uniform(20, 70)), 1.0)
+        return cv2.warpAffine(image, matrix, (width, height), borderValue=240)
+        
+    if category == "noisy":
+        image = cv2.GaussianBlur(place(render(text, 4), 30), (3, 3), 0).astype(np.float32)
+        return np.clip(image + rng.normal(0, 28, image.shape), 0, 255).astype(np.uint8)
+        
+    if category == "shadow":
+        # a strong gradient across the code, as on a photographed screen
+        image = place(render(text, 4), 30).astype(np.float32)
+        shade: np.ndarray = np.linspace(1.0, 0.25, image.shape[1], dtype=np.float32)
+        return (image * shade[None, :]).astype(np.uint8)
+        
+    if category == "empty":
+        # no code, measures what a miss costs
+        image = np.full((400, 400), 240, dtype=np.uint8)
+        cv2.putText(image, text[:20], (10, 200), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 30, 1)
+        return image
+        
+    raise ValueError(f"unknown category {category}")
+
+def corpus(per_category: int = 8, seed: int = 0) -> Iterator[Tuple[str, np.ndarray, str | None]]:
+    # generated deterministically, so every run and every machine decodes the same images
+    rng: np.random.Generator = np.random.default_rng(seed)
+    
+    for category in CATEGORIES:
+        for index in range(per_category):
+            text: str = PAYLOADS[index % len(PAYLOADS)].format(index=index)
+            yield category, sample(category, text, rng), None if category == "empty" else text
+
+def dense(count: int = 40) -> List[Tuple[str, np.ndarray, str | None]]:
+    # distinct version 20 codes whose payloads differ in a few characters, they look alike
+    # everywhere but in some modules, a cache must not answer one with another
+    images: List[Tuple[str, np.ndarray, str | None]] = []
+    for index in range(count):
+        text: str = f"https://example.com/item/{index}/" + "d" * 300
+        code: np.ndarray = np.array(segno.make_qr(text, version=20).to_pil(scale=4, border=4).convert("L"))
+        images.append(("dense", place(code, 20), text))
+        
+    return images
+
+def recompress(image: np.ndarray) -> np.ndarray:
+    # a near duplicate, as the same code captured again or saved as jpeg
+    return cv2.imdecode(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1], cv2.IMREAD_GRAYSCALE)
+
+def recrop(image: np.ndarray) -> np.ndarray:
+    # the same code selected again with a slightly different margin
+    return image[1:-3, 2:]
+
+def rescale(image: np.ndarray) -> np.ndarray:
+    # the same code captured again at another zoom level
+    return cv2.resize(image, None, fx=1.25, fy=1.25, interpolation=cv2.INTER_LINEAR)
+
+def cache_passes(images: List[Tuple[str, np.ndarray, str | None]], dense_images: List[Tuple[str, np.ndarray, str | None]]) -> List[Dict]:
+    decoder: CachedDecoder = CachedDecoder(decode_cache=DecodeCache())
+    results: List[Dict] = []
+    
+    passes: List[Tuple[str, List, Callable | None]] = [
+        ("cold", images, None),
+        ("exact", images, None),
+        ("near", images, recompress),
+        ("recrop", images, recrop),
+        ("rescale", images, rescale),
+        # every dense code is new to the cache, each one must be decoded to its own payload
+        ("dense", dense_images, None),
+    ]
+    for mode, pass_images, transform in passes:
+        seconds: float = 0.0
+        hits: int = 0
+        cached: int = 0
+        
+        for _, image, expected in pass_images:
+            if transform is not None:
+                image = transform(image)
+                
+            start: float = time.perf_counter()
+            texts, _ = decoder.decode(image)
+            seconds += time.perf_counter() - start
+            
+            hits += expected in texts if expected is not None else not any(texts)
+            cached += decoder.stage == "cache"
+            
+        results.append({
+            "benchmark": "decoders.cache",
+            "mode": mode,
+            "images": len(pass_images),
+            "hits": hits,
+            "cached": cached,
+            "ms": round(seconds / len(pass_images) * 1000, 3),
+        })
+        
+    return results
+
+def run(decoders: List[str] = None, per_category: int = 8) -> List[Dict]:
+    images: List[Tuple[str, np.ndarray, str | None]] = list(corpus(per_category))
+    results: List[Dict] = cache_passes(images, dense(per_category * 5))
+    
+    for name in decoders or list(DECODERS):
+        decoder: QRCodeDecoder = DECODERS[name]()
+        
+        seconds: Dict[str, float] = defaultdict(float)
+        hits: Dict[str, int] = defaultdict(int)
+        counts: Dict[str, int] = defaultdict(int)
+        
+        for category, image, expected in images:
+            start: float = time.perf_counter()
+            texts, _ = decoder.decode(image)
+            seconds[category] += time.perf_counter() - start
+            
+            counts[category] += 1
+            # an empty image is a hit when nothing is read from it
+            hits[category] += expected in texts if expected is not None else not any(texts)
+            
+        for category in CATEGORIES:
+            results.append({
+                "benchmark": "decoders.corpus",
+                "decoder": name,
+                "category": category,
+                "images": counts[category],
+                "hits": hits[category],
+                "ms": round(seconds[category] / counts[category] * 1000, 3),
+            })
+            
+        if isinstance(decoder, CascadeDecoder):
+            for stage, stats in decoder.stats.items():
+                results.append({
+                    "benchmark": "decoders.stage",
+                    "stage": stage,
+                    "runs": stats["runs"],
+                    "hits": stats["hits"],
+                    "ms": round(stats["seconds"] / stats["runs"] * 1000, 3) if stats["runs"] else 0.0,
+                })
+                
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.decoders", description="Hit rate and time per image of every registered decoder on a synthetic corpus, per stage of the cascade and with the decode cache.")
+    parser.add_argument("-d", "--decoder", action="append", choices=list(DECODERS), help="decoders to run (default: all)")
+    parser.add_argument("-n", "--per-category", type=int, default=8, help="images per category")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.decoder, args.per_category)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        if result["benchmark"] == "decoders.corpus":
+            print(f"{result['decoder']:>8} {result['category']:>13}: {result['hits']:>3}/{result['images']:<3} {result['ms']:9.2f} ms per image")
+        elif result["benchmark"] == "decoders.cache":
+            print(f"{'cache':>8} {result['mode']:>13}: {result['hits']:>3}/{result['images']:<3} {result['ms']:9.3f} ms per image, {result['cached']} from the cache")
+        else:
+            print(f"{'stage':>8} {result['stage']:>13}: {result['hits']:>3}/{result['runs']:<3} {result['ms']:9.2f} ms per run")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import argparse
+import json
+import statistics
+import tempfile
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import Qt, QRect
+from PySide6.QtGui import QColor, QFont, QGuiApplication, QImage, QPainter
+
+from utils.encoder import PIL_FORMATS, PRESETS, encode_image
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+SUFFIXES: Dict[str, str] = {pil_format: suffix for suffix, pil_format in reversed(PIL_FORMATS.items())}
+
+def synthetic_screenshot(width: int, height: int) -> QImage:
+    # flat areas, text and a gradient, compresses like a desktop and unlike noise
+    image: QImage = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(240, 240, 240))
+    
+    painter: QPainter = QPainter(image)
+    painter.fillRect(QRect(0, 0, width, 40), QColor(45, 45, 48))
+    painter.fillRect(QRect(0, 40, 300, height - 40), QColor(225, 228, 232))
+    
+    for x in range(width // 3, width):
+        painter.setPen(QColor(60 + x * 120 // width, 120, 200))
+        painter.drawLine(x, height * 2 // 3, x, height)
+        
+    painter.setPen(Qt.GlobalColor.black)
+    painter.setFont(QFont("Sans", 11))
+    for row, y in enumerate(range(60, height * 2 // 3, 22)):
+        painter.drawText(320, y, f"{row:04d}  The quick brown fox jumps over the lazy dog  {row * 7919 % 10007}")
+    painter.end()
+    
+    return image
+
+def run(resolutions: List[str] = None, formats: List[str] = None, repeat: int = 3) -> List[Dict]:
+    app = QGuiApplication.instance() or QGuiApplication([])
+    results: List[Dict] = []
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for name in resolutions or RESOLUTIONS:
+            image: QImage = synthetic_screenshot(*RESOLUTIONS[name])
+            raw: int = image.width() * image.height() * 3
+            
+            for pil_format in formats or PRESETS:
+                path: str = os.path.join(directory, f"image.{SUFFIXES[pil_format]}")
+                
+                for preset in PRESETS[pil_format]:
+                    encoded: List[Dict] = [encode_image(image, path, preset) for _ in range(repeat)]
+                    
+                    results.append({
+                        "benchmark": "encode.save",
+                        "resolution": name,
+                        "format": pil_format,
+                        "preset": preset,
+                        "ms": round(statistics.median(result["encode_ms"] for result in encoded), 3),
+                        "bytes": encoded[-1]["bytes"],
+                        "ratio": round(encoded[-1]["bytes"] / raw, 4),
+                    })
+                    
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.encode", description="Encode time and output size per format and preset of the image export.")
+    parser.add_argument("-r", "--resolution", action="append", choices=list(RESOLUTIONS), help="resolutions to run (default: all)")
+    parser.add_argument("-f", "--format", action="append", choices=list(PRESETS), help="formats to run (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="repetitions per preset, the median is reported")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.resolution, args.format, args.repeat)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        print(f"{result['resolution']:>6} {result['format']:>5} {result['preset']:>9}: {result['ms']:9.1f} ms {result['bytes'] / 2 ** 20:8.2f} MiB ({result['ratio']:.1%} of raw)")
+
+if __name__ == "__main__":
+    main()
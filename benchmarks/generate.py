@@ -0,0 +1,126 @@
+import os
+import time
+import argparse
+import json
+import statistics
+import tempfile
+from typing import Callable, Dict, List
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtGui import QImage
+from PIL import Image
+import numpy as np
+import segno
+
+from utils.background import backgrounds
+from utils.generator import SegnoGenerator, cache, rasterize
+from utils.imaging import pil_to_qimage
+
+PAYLOADS: Dict[str, str] = {
+    "url": "https://example.com/some/path?query=1",
+    "text": "The quick brown fox jumps over the lazy dog. " * 10,
+}
+
+def rasterize_pil(qrcode: segno.QRCode, size: int) -> QImage:
+    # the previous path: render at scale 1, resample to the target size and convert twice
+    return pil_to_qimage(qrcode.to_pil().resize((size, size)).convert("RGB"))
+
+RASTERIZERS: Dict[str, Callable[[segno.QRCode, int], QImage]] = {
+    "pil": rasterize_pil,
+    "numpy": rasterize,
+}
+
+def raster(sizes: List[int], repeat: int) -> List[Dict]:
+    results: List[Dict] = []
+    
+    for size in sizes:
+        for payload, text in PAYLOADS.items():
+            qrcode: segno.QRCode = segno.make_qr(text)
+            
+            for name, rasterizer in RASTERIZERS.items():
+                timings: List[float] = []
+                for _ in range(repeat):
+                    start: float = time.perf_counter()
+                    image: QImage = rasterizer(qrcode, size)
+                    timings.append(time.perf_counter() - start)
+                    
+                results.append({
+                    "benchmark": "generate.raster",
+                    "rasterizer": name,
+                    "payload": payload,
+                    "size": size,
+                    "ms": round(statistics.median(timings) * 1000, 3),
+                    "bytes": image.sizeInBytes(),
+                })
+                
+    return results
+
+def synthetic_background(path: str, width: int = 1920, height: int = 1080) -> str:
+    # a photo sized jpeg, the artistic writer has to decode and downscale it
+    x: np.ndarray = np.linspace(0, 255, width, dtype=np.uint8)
+    y: np.ndarray = np.linspace(0, 255, height, dtype=np.uint8)
+    pixels: np.ndarray = np.stack(np.broadcast_arrays(x[None, :], y[:, None], (x[None, :] // 2 + y[:, None] // 2)), axis=-1)
+    
+    Image.fromarray(pixels.astype(np.uint8)).save(path, quality=90)
+    return path
+
+def measure(generator: SegnoGenerator, repeat: int, cold: bool) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+            backgrounds.clear()
+            
+        start: float = time.perf_counter()
+        generator.generate_qr_code()
+        timings.append(time.perf_counter() - start)
+        
+    return statistics.median(timings)
+
+def run(sizes: List[int] = None, repeat: int = 5) -> List[Dict]:
+    results: List[Dict] = raster(sizes or [400, 800], repeat)
+    # the disk tier would turn cold runs into file reads
+    cache.disk = None
+    
+    with tempfile.TemporaryDirectory() as directory:
+        background: str = synthetic_background(os.path.join(directory, "background.jpg"))
+        
+        for size in sizes or [400, 800]:
+            for payload, text in PAYLOADS.items():
+                for kind, path in (("plain", None), ("artistic", background)):
+                    generator: SegnoGenerator = SegnoGenerator(text, path, size)
+                    
+                    for mode, cold in (("cold", True), ("cached", False)):
+                        results.append({
+                            "benchmark": "generate.qr_code",
+                            "kind": kind,
+                            "payload": payload,
+                            "size": size,
+                            "mode": mode,
+                            "ms": round(measure(generator, repeat, cold) * 1000, 3),
+                        })
+                        
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generate", description="Time to generate plain and artistic QR codes, uncached and cached, and to rasterize a code with PIL and with numpy.")
+    parser.add_argument("-s", "--size", type=int, action="append", help="output sizes in pixels (default: 400 and 800)")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="repetitions per case, the median is reported")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.size, args.repeat)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        if result["benchmark"] == "generate.raster":
+            print(f"{result['size']:>5} {result['rasterizer']:>8} {result['payload']:>5} {'raster':>6}: {result['ms']:9.3f} ms, {result['bytes']:>8} bytes")
+        else:
+            print(f"{result['size']:>5} {result['kind']:>8} {result['payload']:>5} {result['mode']:>6}: {result['ms']:9.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import time
+import argparse
+import json
+import statistics
+from typing import Callable, Dict, List, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QRect
+from PySide6.QtGui import QImage
+from PIL import Image
+from PIL.ImageQt import ImageQt, fromqimage
+import cv2
+import numpy as np
+
+from utils.imaging import array_to_qimage, pil_to_qimage, qimage_to_array, qimage_to_pil
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+def synthetic_qimage(width: int, height: int) -> QImage:
+    rng: np.random.Generator = np.random.default_rng(0)
+    pixels: np.ndarray = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    
+    # the format a QScreen grab arrives in
+    return array_to_qimage(pixels, channel_order="BGR").convertToFormat(QImage.Format.Format_RGB32)
+
+def address(obj) -> int:
+    if isinstance(obj, np.ndarray):
+        return obj.__array_interface__["data"][0]
+        
+    if isinstance(obj, QImage):
+        return np.frombuffer(obj.constBits(), dtype=np.uint8).ctypes.data
+        
+    return -1
+
+def copied(result, source) -> int:
+    # bytes of pixel memory the conversion had to allocate and fill
+    if isinstance(result, np.ndarray):
+        if isinstance(source, np.ndarray) and np.shares_memory(result, source):
+            return 0
+        if isinstance(source, QImage):
+            start: int = address(source)
+            if start <= address(result) < start + source.sizeInBytes():
+                return 0
+        return result.nbytes
+        
+    if isinstance(result, QImage):
+        if address(source) == address(result):
+            return 0
+        return result.sizeInBytes()
+        
+    if isinstance(result, Image.Image):
+        # buffers mapped with frombuffer are read only and shared with the source
+        if result.readonly:
+            return 0
+        return result.width * result.height * (1 if result.mode == "L" else 4)
+        
+    return 0
+
+def loaded(image: Image.Image) -> Image.Image:
+    # fromqimage hands out a lazily decoded png, the decode is part of the conversion
+    image.load()
+    return image
+
+def conversions(image: QImage) -> Dict[str, List[Tuple[str, Callable]]]:
+    crop: QRect = QRect(image.width() // 4, image.height() // 4, image.width() // 2, image.height() // 2)
+    
+    return {
+        # what update_qr_code did before the bridge: QImage -> PIL -> numpy -> cv2 -> PIL -> ImageQt
+        "legacy": [
+            ("fromqimage", lambda qimage: loaded(fromqimage(qimage))),
+            ("np.array", np.array),
+            ("cv2.cvtColor", lambda array: cv2.cvtColor(array, cv2.COLOR_BGR2RGB)),
+            ("Image.fromarray", Image.fromarray),
+            ("ImageQt", ImageQt),
+        ],
+        "bridge": [
+            ("qimage_to_array", qimage_to_array),
+            ("array_to_qimage", lambda array: array_to_qimage(array, channel_order="BGR")),
+            ("QImage.copy (crop)", lambda qimage: qimage.copy(crop)),
+        ],
+        "pil": [
+            ("qimage_to_pil", qimage_to_pil),
+            ("pil_to_qimage", pil_to_qimage),
+        ],
+    }
+
+def measure(image: QImage, steps: List[Tuple[str, Callable]], repeat: int) -> List[Dict]:
+    results: List[Dict] = []
+    source = image
+    
+    for name, fn in steps:
+        timings: List[float] = []
+        for _ in range(repeat):
+            start: float = time.perf_counter()
+            result = fn(source)
+            timings.append(time.perf_counter() - start)
+            
+        results.append({
+            "step": name,
+            "ms": round(statistics.median(timings) * 1000, 3),
+            "bytes_copied": copied(result, source),
+        })
+        source = result
+        
+    return results
+
+def run(resolutions: List[str] = None, repeat: int = 5) -> List[Dict]:
+    results: List[Dict] = []
+    
+    for name in resolutions or RESOLUTIONS:
+        image: QImage = synthetic_qimage(*RESOLUTIONS[name])
+        
+        for path, steps in conversions(image).items():
+            measured: List[Dict] = measure(image, steps, repeat)
+            results.append({
+                "benchmark": "imaging.convert",
+                "resolution": name,
+                "path": path,
+                "ms": round(sum(step["ms"] for step in measured), 3),
+                "bytes_copied": sum(step["bytes_copied"] for step in measured),
+                "steps": measured,
+            })
+            
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.imaging", description="Time and bytes copied per image conversion on the capture to decode path.")
+    parser.add_argument("-r", "--resolution", action="append", choices=list(RESOLUTIONS), help="resolutions to run (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="repetitions per conversion, the median is reported")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.resolution, args.repeat)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        print(f"{result['resolution']:>6} {result['path']:>7}: {result['ms']:9.3f} ms {result['bytes_copied'] / 2 ** 20:8.1f} MiB copied")
+        for step in result["steps"]:
+            print(f"{'':>16}{step['step']:<20} {step['ms']:9.3f} ms {step['bytes_copied'] / 2 ** 20:8.1f} MiB")
+
+if __name__ == "__main__":
+    main()
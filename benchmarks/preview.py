@@ -0,0 +1,110 @@
+import os
+import time
+import argparse
+import json
+import statistics
+from typing import Callable, Dict, List, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from benchmarks.encode import synthetic_screenshot
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "3x4k": (11520, 2160),
+}
+
+# label sizes a resize passes through, from a small window to a maximized one
+LABEL_SIZES: List[Tuple[int, int]] = [(480, 270), (960, 540), (1600, 900)]
+
+def median_ms(fn: Callable[[], object], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        
+    return round(statistics.median(timings) * 1000, 3)
+
+def pyramid(name: str, image: QImage, repeat: int) -> List[Dict]:
+    from utils.preview import PreviewPyramid
+    
+    levels: PreviewPyramid = PreviewPyramid(image)
+    results: List[Dict] = [{
+        "benchmark": "preview.pyramid",
+        "resolution": name,
+        "levels": len(levels.levels),
+        "bytes": levels.nbytes,
+        # built once per capture on a worker thread
+        "ms": median_ms(lambda: PreviewPyramid(image), repeat),
+    }]
+    
+    for width, height in LABEL_SIZES:
+        size: QSize = QSize(width, height)
+        for source, render in (
+            ("original", lambda: image.scaled(size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)),
+            ("pyramid", lambda: levels.render(size)),
+        ):
+            results.append({
+                "benchmark": "preview.resize",
+                "resolution": name,
+                "source": source,
+                "label": [width, height],
+                "ms": median_ms(render, repeat),
+            })
+            
+    return results
+
+def run(resolutions: List[str] = None, repeat: int = 5) -> List[Dict]:
+    app: QApplication = QApplication.instance() or QApplication([])
+    
+    from screenshot.menu import ScreenshotMenu
+    menu: ScreenshotMenu = ScreenshotMenu()
+    menu.resize(500, 400)
+    menu.show()
+    app.processEvents()
+    
+    results: List[Dict] = []
+    for name in resolutions or RESOLUTIONS:
+        image: QImage = synthetic_screenshot(*RESOLUTIONS[name])
+        
+        # the part of update_screenshot that runs on the GUI thread, the history and the pyramid are built off thread
+        results.append({
+            "benchmark": "preview.update_screenshot",
+            "resolution": name,
+            "label": list(menu.screenshot.size().toTuple()),
+            "ms": median_ms(lambda: menu.show_image(image), repeat),
+        })
+        results.extend(pyramid(name, image, repeat))
+        
+    menu.close()
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.preview", description="Time to scale a capture into the screenshot preview, to build its preview pyramid and to re-render it after a resize.")
+    parser.add_argument("-r", "--resolution", action="append", choices=list(RESOLUTIONS), help="resolutions to run (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="repetitions per resolution, the median is reported")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.resolution, args.repeat)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        if result["benchmark"] == "preview.pyramid":
+            print(f"{result['resolution']:>6}: {result['ms']:9.1f} ms to build {result['levels']} levels ({result['bytes'] / 2 ** 20:.1f} MiB)")
+        elif result["benchmark"] == "preview.resize":
+            print(f"{result['resolution']:>6}: {result['ms']:9.1f} ms from the {result['source']} into a {result['label'][0]}x{result['label'][1]} preview")
+        else:
+            print(f"{result['resolution']:>6}: {result['ms']:9.1f} ms into a {result['label'][0]}x{result['label'][1]} preview")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import argparse
+import json
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import Qt, QEvent, QPointF, QRect
+from PySide6.QtGui import QColor, QLinearGradient, QMouseEvent, QPainter, QPixmap
+from PySide6.QtWidgets import QApplication
+
+from screenshot.handler import ScreenHandler
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "3x4k": (11520, 2160),
+}
+
+def synthetic_pixmap(width: int, height: int) -> QPixmap:
+    pixmap: QPixmap = QPixmap(width, height)
+    gradient: QLinearGradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(30, 90, 160))
+    gradient.setColorAt(1, QColor(220, 180, 40))
+    
+    painter: QPainter = QPainter(pixmap)
+    painter.fillRect(pixmap.rect(), gradient)
+    painter.end()
+    
+    return pixmap
+
+def mouse_event(kind: QEvent.Type, x: float, y: float) -> QMouseEvent:
+    pos: QPointF = QPointF(x, y)
+    return QMouseEvent(kind, pos, pos, Qt.MouseButton.LeftButton, Qt.MouseButton.LeftButton, Qt.KeyboardModifier.NoModifier)
+
+def drag(handler: ScreenHandler, steps: int, full_repaint: bool = False) -> float:
+    width, height = handler.width(), handler.height()
+    app: QApplication = QApplication.instance()
+    
+    QApplication.sendEvent(handler, mouse_event(QEvent.Type.MouseButtonPress, width * 0.1, height * 0.1))
+    app.processEvents()
+    
+    start: float = time.perf_counter()
+    for step in range(1, steps + 1):
+        # rubber band sweeping from the press position towards the opposite corner
+        t: float = step / steps
+        x: float = width * (0.1 + 0.8 * t)
+        y: float = height * (0.1 + 0.8 * t)
+        
+        QApplication.sendEvent(handler, mouse_event(QEvent.Type.MouseMove, x, y))
+        if full_repaint:
+            handler.update()
+        app.processEvents()
+        
+    return time.perf_counter() - start
+
+def run(resolutions: List[str] = None, steps: int = 200) -> List[Dict]:
+    app: QApplication = QApplication.instance() or QApplication(sys.argv)
+    results: List[Dict] = []
+    
+    for name in resolutions or RESOLUTIONS:
+        width, height = RESOLUTIONS[name]
+        
+        handler: ScreenHandler = ScreenHandler(screen=app.primaryScreen())
+        handler.setGeometry(QRect(0, 0, width, height))
+        handler.screen_width, handler.screen_height = width, height
+        
+        start: float = time.perf_counter()
+        handler.set_screenshot(synthetic_pixmap(width, height))
+        prepare: float = time.perf_counter() - start
+        
+        handler.snipping = True
+        handler.show()
+        app.processEvents()
+        
+        for mode, full in (("dirty", False), ("full", True)):
+            elapsed: float = drag(handler, steps, full_repaint=full)
+            results.append({
+                "benchmark": "render.drag",
+                "resolution": name,
+                "mode": mode,
+                "frames": steps,
+                "fps": round(steps / elapsed, 1),
+                "prepare_ms": round(prepare * 1000, 2),
+            })
+            
+        handler.close()
+        handler.deleteLater()
+        app.processEvents()
+        
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.render", description="Frames per second of synthetic rubber band drags on the selection overlay.")
+    parser.add_argument("-r", "--resolution", action="append", choices=list(RESOLUTIONS), help="resolutions to run (default: all)")
+    parser.add_argument("-n", "--steps", type=int, default=200, help="mouse moves per drag")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    
+    results: List[Dict] = run(args.resolution, args.steps)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    for result in results:
+        print(f"{result['resolution']:>6} {result['mode']:>5}: {result['fps']:8.1f} fps (background prepared in {result['prepare_ms']} ms)")
+
+if __name__ == "__main__":
+    main()
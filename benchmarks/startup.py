@@ -0,0 +1,117 @@
+import os
+import re
+import sys
+import time
+import argparse
+import json
+import statistics
+import subprocess
+from collections import defaultdict
+from typing import Dict, List
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+def child() -> None:
+    # runs in a fresh interpreter, prints the phases of the start up as JSON
+    start: float = time.perf_counter()
+    
+    from PySide6.QtCore import QEvent, QObject, QTimer
+    from PySide6.QtWidgets import QApplication
+    
+    import main
+    imported: float = time.perf_counter()
+    
+    app: QApplication = QApplication([])
+    widget = main.MainWidget()
+    constructed: float = time.perf_counter()
+    
+    painted: List[float] = []
+    
+    class PaintFilter(QObject):
+        def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+            if event.type() == QEvent.Type.Paint and not painted:
+                painted.append(time.perf_counter())
+                QTimer.singleShot(0, app.quit)
+            return False
+            
+    paint_filter: PaintFilter = PaintFilter()
+    widget.installEventFilter(paint_filter)
+    widget.show()
+    app.exec()
+    
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "construct_ms": (constructed - imported) * 1000,
+        "first_paint_ms": (painted[0] - start) * 1000,
+        "modules": sorted(name for name in ("cv2", "numpy", "PIL", "segno") if name in sys.modules),
+    }))
+
+def launch() -> Dict:
+    start: float = time.perf_counter()
+    output: str = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child"], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    elapsed: float = time.perf_counter() - start
+    
+    result: Dict = json.loads(output.strip().splitlines()[-1])
+    # includes the interpreter start up, which is what a user waits for
+    result["process_ms"] = elapsed * 1000
+    return result
+
+def import_breakdown() -> Dict[str, float]:
+    # self time of every imported module, summed per top level package
+    stderr: str = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    
+    packages: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            packages[match.group(4).split(".")[0]] += int(match.group(1)) / 1000
+            
+    return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+def run(repeat: int = 5, top: int = 10) -> List[Dict]:
+    launches: List[Dict] = [launch() for _ in range(repeat)]
+    
+    result: Dict = {"benchmark": "startup.main", "modules": launches[-1]["modules"]}
+    for key in ("import_ms", "construct_ms", "first_paint_ms", "process_ms"):
+        result[key] = round(statistics.median(launch[key] for launch in launches), 3)
+        
+    breakdown: Dict[str, float] = import_breakdown()
+    imports: Dict = {
+        "benchmark": "startup.imports",
+        "total_ms": round(sum(breakdown.values()), 3),
+        "packages": {name: round(ms, 3) for name, ms in list(breakdown.items())[:top]},
+    }
+    
+    return [result, imports]
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="Import time breakdown and time to first paint of the main window.")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="number of launches, the median is reported")
+    parser.add_argument("-t", "--top", type=int, default=10, help="packages listed in the import breakdown")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    
+    if args.child:
+        child()
+        return
+        
+    results: List[Dict] = run(args.repeat, args.top)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+        
+    launch, imports = results
+    print(f"first paint {launch['first_paint_ms']:8.1f} ms (import {launch['import_ms']:.1f} ms, construct {launch['construct_ms']:.1f} ms)")
+    print(f"process     {launch['process_ms']:8.1f} ms, heavy modules loaded: {', '.join(launch['modules']) or 'none'}")
+    print(f"imports     {imports['total_ms']:8.1f} ms")
+    for name, ms in imports["packages"].items():
+        print(f"{'':>12}{name:<20} {ms:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,86 @@
 import sys
 import os
+import multiprocessing
+from importlib import import_module
 from pathlib import Path
+from typing import Dict, List, Tuple
 
-from PySide6.QtWidgets import QApplication, QTabWidget
+from PySide6.QtWidgets import QApplication, QTabWidget, QWidget
 from PySide6.QtGui import QIcon, QPixmap
 
-from screenshot.menu import ScreenshotMenu
-from qrcode import QRCodeReaderMenu, QRCodeCreatorMenu
+from screenshot.tool import ScreenshotTool
+
+# attribute, title, module and class of every tab, and whether it captures screens.
+# The modules (and with them cv2, numpy, PIL and segno) are imported when a tab is first shown.
+TABS: List[Tuple[str, str, str, str, bool]] = [
+    ("screenshot", "Screenshot", "screenshot.menu", "ScreenshotMenu", True),
+    ("qrcode_reader", "QRCode Reader", "qrcode.reader", "QRCodeReaderMenu", True),
+    ("qrcode_creator", "QRCode Creator", "qrcode.creator", "QRCodeCreatorMenu", False),
+]
 
 class MainWidget(QTabWidget):
     def __init__(self):
         super(MainWidget, self).__init__()
         
-        self.screenshot = ScreenshotMenu(self)
-        self.addTab(self.screenshot, "Screenshot")
-        
-        self.qrcode_reader = QRCodeReaderMenu(self)
-        self.addTab(self.qrcode_reader, "QRCode Reader")
+        # one set of screen overlays, shared by every tab that captures
+        self.screenshot_tool = ScreenshotTool(outer=self)
+        self._tabs: Dict[str, QWidget] = {}
         
-        self.qrcode_creator = QRCodeCreatorMenu(self)
-        self.addTab(self.qrcode_creator, "QRCode Creator")
+        for _, title, _, _, _ in TABS:
+            self.addTab(QWidget(), title)
+            
+        self.currentChanged.connect(self.build_tab)
+        self.build_tab(self.currentIndex())
         
         self.setWindowTitle("SnippingPanda")
         self.resize(500, 400)
-
+        
+    @property
+    def screenshot(self):
+        return self.tab("screenshot")
+        
+    @property
+    def qrcode_reader(self):
+        return self.tab("qrcode_reader")
+        
+    @property
+    def qrcode_creator(self):
+        return self.tab("qrcode_creator")
+        
+    def tab(self, name: str) -> QWidget:
+        return self.build_tab([tab[0] for tab in TABS].index(name))
+        
+    def build_tab(self, index: int) -> QWidget:
+        name, title, module, cls, captures = TABS[index]
+        if name in self._tabs:
+            return self._tabs[name]
+            
+        widget_class = getattr(import_module(module), cls)
+        widget: QWidget = widget_class(self, self.screenshot_tool) if captures else widget_class(self)
+        self._tabs[name] = widget
+        
+        # the placeholder is swapped for the real tab without changing the selection
+        current: int = self.currentIndex()
+        placeholder: QWidget = self.widget(index)
+        
+        self.blockSignals(True)
+        self.removeTab(index)
+        self.insertTab(index, widget, title)
+        self.setCurrentIndex(current)
+        self.blockSignals(False)
+        
+        placeholder.deleteLater()
+        return widget
+        
 def main() -> None:
+    # decoding runs in spawned processes, which start this executable again when it is frozen
+    multiprocessing.freeze_support()
+    
+    if "--daemon" in sys.argv[1:]:
+        # headless, the widgets are never created
+        from qrcode.daemon import main as daemon
+        sys.exit(daemon(["serve"] + [arg for arg in sys.argv[1:] if arg != "--daemon"]))
+        
     app = QApplication(sys.argv)
     main_widget = MainWidget()
     main_widget.show()
@@ -1,2 +1,14 @@
-from .creator import QRCodeCreatorMenu
-from .reader import QRCodeReaderMenu
\ No newline at end of file
+from importlib import import_module
+
+_LAZY = {
+    "QRCodeCreatorMenu": ".creator",
+    "QRCodeReaderMenu": ".reader",
+}
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        
+    value = getattr(import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
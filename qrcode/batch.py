@@ -0,0 +1,143 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, TextIO
+
+import cv2
+import numpy as np
+
+from utils import DECODERS
+from utils.decoder import CachedDecoder, QRCodeDecoder, enable_disk_cache
+from utils.pool import imap_bounded, iter_chunks
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+# one decoder per worker process, created by the pool initializer
+_decoder: QRCodeDecoder = None
+
+def init_worker(decoder: str = "cascade", cache_dir: str = None) -> None:
+    global _decoder
+    
+    # the pool already runs one process per core, nested threads only compete with it
+    cv2.setNumThreads(1)
+    _decoder = DECODERS[decoder]()
+    
+    # results are shared through the directory by all workers and later runs
+    if cache_dir:
+        enable_disk_cache(cache_dir)
+        if not isinstance(_decoder, CachedDecoder):
+            _decoder = CachedDecoder(_decoder)
+
+def read_image(path: str) -> np.ndarray:
+    # np.fromfile + imdecode also works for non ascii paths on windows
+    data: np.ndarray = np.fromfile(path, dtype=np.uint8)
+    image: np.ndarray = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+    
+    if image is None:
+        raise ValueError("unsupported or corrupt image")
+        
+    return image
+
+def decode_file(path: str) -> Dict:
+    global _decoder
+    if _decoder is None:
+        _decoder = DECODERS["cascade"]()
+        
+    result: Dict = {"path": path, "texts": [], "boxes": [], "timings": {}}
+    
+    start: float = time.perf_counter()
+    try:
+        image: np.ndarray = read_image(path)
+    except (OSError, ValueError) as e:
+        result["error"] = str(e)
+        return result
+        
+    read: float = time.perf_counter()
+    texts, boxes = _decoder.decode(image)
+    done: float = time.perf_counter()
+    
+    result["texts"] = texts
+    result["boxes"] = boxes
+    if hasattr(_decoder, "stage"):
+        result["stage"] = _decoder.stage
+    result["timings"] = {
+        "read_ms": round((read - start) * 1000, 3),
+        "decode_ms": round((done - read) * 1000, 3),
+    }
+    
+    return result
+
+def decode_files(paths: List[str]) -> List[Dict]:
+    return [decode_file(path) for path in paths]
+
+def iter_paths(patterns: Iterable[str], recursive: bool = False) -> Iterator[str]:
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                for root, _, files in os.walk(pattern):
+                    for name in sorted(files):
+                        if name.lower().endswith(IMAGE_SUFFIXES):
+                            yield os.path.join(root, name)
+            else:
+                for entry in sorted(os.scandir(pattern), key=lambda e: e.name):
+                    if entry.is_file() and entry.name.lower().endswith(IMAGE_SUFFIXES):
+                        yield entry.path
+        elif os.path.isfile(pattern):
+            yield pattern
+        else:
+            for path in glob.iglob(pattern, recursive=recursive):
+                if os.path.isfile(path) and path.lower().endswith(IMAGE_SUFFIXES):
+                    yield path
+
+def run(paths: Iterable[str], workers: int = None, chunksize: int = 8, decoder: str = "cascade", cache_dir: str = None) -> Iterator[Dict]:
+    workers = workers or os.cpu_count() or 1
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(decoder, cache_dir)) as executor:
+        for results in imap_bounded(executor, decode_files, iter_chunks(paths, chunksize), workers * 2):
+            yield from results
+            
+def write_results(results: Iterable[Dict], out: TextIO) -> Dict[str, int]:
+    stats: Dict[str, int] = {"files": 0, "codes": 0, "errors": 0}
+    
+    for result in results:
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        
+        stats["files"] += 1
+        stats["codes"] += len([text for text in result["texts"] if text])
+        stats["errors"] += "error" in result
+        
+    out.flush()
+    return stats
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m qrcode.batch", description="Decode QR codes in image files and write the results as JSONL.")
+    parser.add_argument("paths", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="write JSONL to this file instead of stdout")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="descend into sub directories and expand ** in globs")
+    parser.add_argument("--chunksize", type=int, default=8, help="files handed to a worker at once")
+    parser.add_argument("-d", "--decoder", choices=list(DECODERS), default="cascade", help="decoder engine (default: cascade)")
+    parser.add_argument("--cache-dir", help="keep decode results in this directory and reuse them for identical images")
+    args = parser.parse_args(argv)
+    
+    start: float = time.perf_counter()
+    results: Iterator[Dict] = run(iter_paths(args.paths, args.recursive), args.workers, max(args.chunksize, 1), args.decoder, args.cache_dir)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as out:
+            stats = write_results(results, out)
+    else:
+        stats = write_results(results, sys.stdout)
+        
+    elapsed: float = time.perf_counter() - start
+    rate: float = stats["files"] / elapsed if elapsed else 0.0
+    print(f"{stats['files']} files, {stats['codes']} codes, {stats['errors']} errors in {elapsed:.2f}s ({rate:.1f} files/s)", file=sys.stderr)
+    
+    return 1 if stats["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
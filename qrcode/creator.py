@@ -1,18 +1,32 @@
+import time
+
 from PySide6.QtCore import Qt, QStandardPaths, QTimer
 from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import QWidget, QLabel, QSizePolicy, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QFileDialog, QGroupBox, QLineEdit
-from PIL.ImageQt import ImageQt
-from PIL import Image
-
 from utils import save_image, GENERATORS
+from utils.background import load_background
+from utils.generator import enable_disk_cache
+from utils.preview import PreviewLabel
+from utils.worker import TaskRunner
 
 class QRCodeCreatorMenu(QWidget):
     def __init__(self, main = None):
         super(QRCodeCreatorMenu, self).__init__()
         
+        cache_path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+        if cache_path:
+            enable_disk_cache(f"{cache_path}/qrcodes")
+            
         self.timer = QTimer()
         self.timer.timeout.connect(self.timer_done)
         
+        # only the newest request is shown, superseded ones are dropped
+        self.runner = TaskRunner(max_workers=2, latest_only=True, parent=self)
+        self.runner.finished.connect(self.generation_done)
+        self.runner.failed.connect(self.generation_failed)
+        # moving average of recent generation times in seconds, drives the debounce
+        self.generation_time = 0.25
+        
         self.input = QTextEdit(self)
         self.input.setMaximumHeight(30)
         self.input.setVisible(True)
@@ -47,7 +61,7 @@ class QRCodeCreatorMenu(QWidget):
         
         buttons.addWidget(self.create)
         
-        self.output = QLabel(self)
+        self.output = PreviewLabel(self)
         self.output.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.output.setAlignment(Qt.AlignCenter)
         
@@ -67,25 +81,27 @@ class QRCodeCreatorMenu(QWidget):
         
     def get_file(self):
         inital_path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.DocumentsLocation)
-        fname = QFileDialog.getOpenFileName(self, 'Open File', inital_path, "Image files (*.jpg *.jpeg *.png)")
+        fname = QFileDialog.getOpenFileName(self, 'Open File', inital_path, "Image files (*.jpg *.jpeg *.png *.gif *.webp)")
         
         path = fname[0]
         
         if path is None or path == '':
             return
         
-        img = Image.open(f"{path}")
-        
-        image = ImageQt(img)
-        self.input_image = QPixmap.fromImage(image)
+        # decoded once here and reused by every regeneration
+        self.input_image = load_background(path)
         self.input_image_text.setText(path)
         
     def delete_file(self):
         self.input_image = None
         self.input_image_text.setText("")
         
+    def debounce(self):
+        # cheap payloads preview almost instantly, expensive ones wait for a typing pause
+        return int(min(max(self.generation_time * 2000, 50), 1500))
+        
     def update_qr_code(self):
-        self.timer.start(1500)
+        self.timer.start(self.debounce())
         
     def timer_done(self):
         self.timer.stop()
@@ -98,22 +114,28 @@ class QRCodeCreatorMenu(QWidget):
             return
         
         gen = generator(
-            self.input, 
-            self.input_image, 
-            self.input_image_text
+            self.input.toPlainText(),
+            self.input_image_text.text() if self.input_image else None
         )
+        self.runner.submit(self.generate, gen)
+        
+    @staticmethod
+    def generate(gen):
+        start = time.perf_counter()
         image = gen.generate_qr_code()
         
+        return image, time.perf_counter() - start
+        
+    def generation_done(self, generation, result):
+        image, elapsed = result
+        self.generation_time = 0.7 * self.generation_time + 0.3 * elapsed
+        
         self.output_image = image
-        image_pixmap = QPixmap.fromImage(image)
-        
-        self.output.setPixmap(
-            image_pixmap.scaled(
-                self.output.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-        )
+        self.output.set_image(image)
+        
+    def generation_failed(self, generation, error):
+        self.output_image = None
+        self.output.clear_image(f"The QR Code could not be generated:\n{error}")
         
     def download_qr_code(self):
         msgs = {
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+# requests are one JSON line, followed by `length` bytes of payload (an encoded image) if given.
+# Responses are one JSON line with "ok", followed by `length` bytes (PNG or SVG) if given.
+MAX_PAYLOAD: int = 64 * 2 ** 20
+
+CONTENT_TYPES: Dict[str, str] = {"png": "image/png", "svg": "image/svg+xml", "gif": "image/gif"}
+
+class DaemonError(RuntimeError):
+    pass
+
+def default_socket() -> str:
+    directory: str = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"snippingpanda-{os.getuid()}.sock")
+
+# decoders are not thread safe, every worker thread keeps its own
+_local: threading.local = threading.local()
+
+def thread_decoder(name: str):
+    from utils import DECODERS
+    from utils.decoder import CachedDecoder
+    
+    decoders: Dict = _local.__dict__.setdefault("decoders", {})
+    if name not in decoders:
+        if name not in DECODERS:
+            raise ValueError(f"unknown decoder {name}")
+        # the decode cache is shared by all threads, it answers repeated images
+        decoders[name] = CachedDecoder(DECODERS[name]())
+        
+    return decoders[name]
+
+def decode(request: Dict, payload: bytes | None) -> Tuple[Dict, bytes | None]:
+    import cv2
+    import numpy as np
+    from .batch import read_image
+    
+    start: float = time.perf_counter()
+    if payload is not None:
+        image: np.ndarray = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError("unsupported or corrupt image")
+    elif request.get("path"):
+        image = read_image(request["path"])
+    else:
+        raise ValueError("decode needs a path or image bytes")
+        
+    decoder = thread_decoder(request.get("decoder", "cascade"))
+    texts, boxes = decoder.decode(image)
+    
+    return {
+        "texts": texts,
+        "boxes": boxes,
+        "stage": decoder.stage,
+        "decode_ms": round((time.perf_counter() - start) * 1000, 3),
+    }, None
+
+def generate(request: Dict, payload: bytes | None) -> Tuple[Dict, bytes | None]:
+    from utils.generator import SegnoGenerator
+    
+    kind: str = request.get("kind", "png")
+    if kind not in CONTENT_TYPES:
+        raise ValueError(f"unknown kind {kind}")
+    if not request.get("text"):
+        raise ValueError("generate needs a text")
+        
+    data: bytes = SegnoGenerator(request["text"], request.get("background"), int(request.get("size", 800))).export(kind)
+    
+    return {"content_type": CONTENT_TYPES[kind]}, data
+
+def request_key(request: Dict, payload: bytes | None) -> str:
+    from utils.cache import content_key, file_identity
+    
+    # identical requests share one computation, files are identified by path, size and mtime
+    if request["op"] == "decode":
+        source = hashlib.blake2b(payload, digest_size=20).hexdigest() if payload is not None else file_identity(request.get("path"))
+        return content_key("decode", request.get("decoder", "cascade"), source)
+        
+    return content_key("generate", request.get("text"), request.get("size", 800), request.get("kind", "png"), file_identity(request.get("background")))
+
+def warm_up(barrier: threading.Barrier) -> None:
+    import segno
+    import numpy as np
+    
+    # every worker thread builds its detectors before the first request comes in
+    barrier.wait()
+    code: np.ndarray = np.array(segno.make_qr("warm up").to_pil(scale=4, border=4).convert("L"))
+    thread_decoder("cascade").decoder.decode(code)
+
+class Daemon():
+    HANDLERS: Dict[str, Callable[[Dict, bytes | None], Tuple[Dict, bytes | None]]] = {
+        "decode": decode,
+        "generate": generate,
+    }
+    
+    def __init__(self, path: str = None, workers: int = None) -> None:
+        self.path: str = path or default_socket()
+        self.workers: int = workers or min(os.cpu_count() or 1, 8)
+        self.executor: ThreadPoolExecutor = None
+        
+        self.started: float = time.time()
+        # running computations by request key, concurrent duplicates wait on the same one
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stop: asyncio.Event = None
+        
+        self.requests: int = 0
+        self.coalesced: int = 0
+        self.errors: int = 0
+        self.connections: int = 0
+        
+    def stats(self) -> Dict:
+        from utils.decoder import cache as decode_cache
+        from utils.generator import cache as generator_cache
+        
+        return {
+            "uptime": round(time.time() - self.started, 3),
+            "workers": self.workers,
+            "connections": self.connections,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "decode_cache": decode_cache.stats(),
+            "generator_cache": generator_cache.stats(),
+        }
+        
+    async def run(self, request: Dict, payload: bytes | None) -> Tuple[Dict, bytes | None]:
+        key: str = request_key(request, payload)
+        
+        future: asyncio.Future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self.HANDLERS[request["op"]], request, payload)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            
+        # a client that disconnects must not cancel the work others wait for
+        header, data = await asyncio.shield(future)
+        return dict(header), data
+        
+    async def dispatch(self, request: Dict, payload: bytes | None) -> Tuple[Dict, bytes | None]:
+        op: str = request.get("op")
+        
+        if op == "ping":
+            return {"pid": os.getpid()}, None
+        if op == "stats":
+            return self.stats(), None
+        if op == "shutdown":
+            self._stop.set()
+            return {}, None
+        if op in self.HANDLERS:
+            return await self.run(request, payload)
+            
+        raise ValueError(f"unknown op {op}")
+        
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            # requests of one connection are answered in order, connections run concurrently
+            while True:
+                line: bytes = await reader.readline()
+                if not line:
+                    break
+                    
+                request: Dict = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        request = {}
+                        raise ValueError("a request is a JSON object")
+                        
+                    length: int = int(request.get("length", 0))
+                    if not 0 <= length <= MAX_PAYLOAD:
+                        # the payload can not be skipped, so the connection ends here
+                        writer.write(self.error(request, f"payload must be at most {MAX_PAYLOAD} bytes"))
+                        break
+                        
+                    payload: bytes | None = await reader.readexactly(length) if length else None
+                    
+                    self.requests += 1
+                    header, data = await self.dispatch(request, payload)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # failures of a single request are reported to the client, the daemon keeps running
+                    writer.write(self.error(request, str(e)))
+                    await writer.drain()
+                    continue
+                    
+                header.update({"id": request.get("id"), "ok": True})
+                if data is not None:
+                    header["length"] = len(data)
+                    
+                writer.write(json.dumps(header, ensure_ascii=False).encode("utf8") + b"\n")
+                if data is not None:
+                    writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        except asyncio.CancelledError:
+            # idle connections are cancelled when the daemon stops, that is a normal end
+            pass
+        finally:
+            writer.close()
+            
+    def error(self, request: Dict, message: str) -> bytes:
+        self.errors += 1
+        return json.dumps({"id": request.get("id"), "ok": False, "error": message}).encode("utf8") + b"\n"
+        
+    def claim_socket(self) -> None:
+        if not os.path.exists(self.path):
+            return
+            
+        # a socket file without a listener is left over from a daemon that was killed
+        probe: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.remove(self.path)
+            return
+        finally:
+            probe.close()
+            
+        raise DaemonError(f"a daemon is already listening on {self.path}")
+        
+    async def serve(self, ready: Callable[[], None] = None) -> None:
+        self.claim_socket()
+        
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="daemon")
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        
+        start: float = time.perf_counter()
+        barrier: threading.Barrier = threading.Barrier(self.workers)
+        await asyncio.gather(*[loop.run_in_executor(self.executor, warm_up, barrier) for _ in range(self.workers)])
+        warm_ms: float = (time.perf_counter() - start) * 1000
+        
+        self._stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self._stop.set)
+            
+        # only the user that started the daemon may connect
+        umask: int = os.umask(0o177)
+        try:
+            server: asyncio.AbstractServer = await asyncio.start_unix_server(self.handle, path=self.path)
+        finally:
+            os.umask(umask)
+            
+        print(f"listening on {self.path} with {self.workers} workers (warm up {warm_ms:.0f} ms)", file=sys.stderr)
+        if ready is not None:
+            ready()
+            
+        try:
+            await self._stop.wait()
+        finally:
+            # open connections are not waited for, their handlers are cancelled with the loop
+            server.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+class Client():
+    def __init__(self, path: str = None, timeout: float = 60.0) -> None:
+        self.socket: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path or default_socket())
+        self.file = self.socket.makefile("rwb")
+        self._ids: int = 0
+        
+    def __enter__(self) -> "Client":
+        return self
+        
+    def __exit__(self, *args) -> None:
+        self.close()
+        
+    def close(self) -> None:
+        self.file.close()
+        self.socket.close()
+        
+    def request(self, request: Dict, payload: bytes = None) -> Tuple[Dict, bytes | None]:
+        self._ids += 1
+        request = dict(request, id=self._ids)
+        if payload is not None:
+            request["length"] = len(payload)
+            
+        self.file.write(json.dumps(request, ensure_ascii=False).encode("utf8") + b"\n")
+        if payload is not None:
+            self.file.write(payload)
+        self.file.flush()
+        
+        line: bytes = self.file.readline()
+        if not line:
+            raise DaemonError("the daemon closed the connection")
+            
+        header: Dict = json.loads(line)
+        data: bytes | None = self.file.read(header["length"]) if header.get("length") else None
+        if not header.get("ok"):
+            raise DaemonError(header.get("error"))
+            
+        return header, data
+        
+    def decode(self, path: str = None, data: bytes = None, decoder: str = "cascade") -> Dict:
+        # paths are resolved by the daemon, which may run in another directory
+        request: Dict = {"op": "decode", "decoder": decoder}
+        if data is None:
+            request["path"] = os.path.abspath(path)
+            
+        return self.request(request, data)[0]
+        
+    def generate(self, text: str, size: int = 800, kind: str = "png", background: str = None) -> bytes:
+        request: Dict = {"op": "generate", "text": text, "size": size, "kind": kind}
+        if background:
+            request["background"] = os.path.abspath(background)
+            
+        return self.request(request)[1]
+        
+    def stats(self) -> Dict:
+        return self.request({"op": "stats"})[0]
+        
+    def shutdown(self) -> None:
+        self.request({"op": "shutdown"})
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m qrcode.daemon", description="Keep a warmed up QR decoder and generator running and serve them over a Unix domain socket.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--socket", default=None, help=f"socket path (default: {default_socket() if hasattr(os, 'getuid') else 'none'})")
+    commands = parser.add_subparsers(dest="command")
+    
+    serve = commands.add_parser("serve", parents=[common], help="run the daemon (default)")
+    serve.add_argument("-j", "--workers", type=int, default=None, help="decoder and generator threads (default: cores, at most 8)")
+    
+    decode_command = commands.add_parser("decode", parents=[common], help="decode image files through a running daemon, one JSON line per file")
+    decode_command.add_argument("paths", nargs="+")
+    decode_command.add_argument("-d", "--decoder", default="cascade")
+    
+    generate_command = commands.add_parser("generate", parents=[common], help="generate a QR code through a running daemon")
+    generate_command.add_argument("text")
+    generate_command.add_argument("-o", "--output", required=True, help="file to write the code to")
+    generate_command.add_argument("-s", "--size", type=int, default=800)
+    generate_command.add_argument("-f", "--format", choices=list(CONTENT_TYPES), default="png")
+    generate_command.add_argument("-b", "--background", default=None)
+    
+    commands.add_parser("stats", parents=[common], help="print the statistics of a running daemon")
+    commands.add_parser("stop", parents=[common], help="stop a running daemon")
+    
+    argv = sys.argv[1:] if argv is None else argv
+    # without a command the daemon itself is started
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["serve"] + argv
+    args = parser.parse_args(argv)
+    
+    if not hasattr(socket, "AF_UNIX"):
+        print("the daemon needs Unix domain sockets, which this platform does not offer", file=sys.stderr)
+        return 1
+        
+    if args.command == "serve":
+        try:
+            asyncio.run(Daemon(args.socket, getattr(args, "workers", None)).serve())
+        except DaemonError as e:
+            print(e, file=sys.stderr)
+            return 1
+        return 0
+        
+    try:
+        with Client(args.socket) as client:
+            if args.command == "decode":
+                for path in args.paths:
+                    try:
+                        result: Dict = client.decode(path, decoder=args.decoder)
+                    except DaemonError as e:
+                        result = {"error": str(e)}
+                    result.pop("id", None)
+                    result.pop("ok", None)
+                    print(json.dumps(dict(path=path, **result), ensure_ascii=False))
+            elif args.command == "generate":
+                data: bytes = client.generate(args.text, args.size, args.format, args.background)
+                with open(args.output, "wb") as f:
+                    f.write(data)
+            elif args.command == "stats":
+                print(json.dumps(client.stats(), indent=2))
+            elif args.command == "stop":
+                client.shutdown()
+    except (OSError, DaemonError) as e:
+        print(f"daemon: {e}", file=sys.stderr)
+        return 1
+        
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from utils.pool import imap_bounded, iter_chunks
+
+FORMATS = ("png", "svg", "gif")
+
+# generator options of the worker processes, set by the pool initializer
+_options: Dict = {"generator": "segno", "kind": "png", "size": 800}
+
+def init_worker(options: Dict, cache_dir: str = None) -> None:
+    _options.update(options)
+    
+    if cache_dir:
+        from utils.generator import enable_disk_cache
+        enable_disk_cache(cache_dir)
+
+def iter_csv(path: str) -> Iterator[Dict]:
+    with open(path, newline="", encoding="utf8") as f:
+        reader: csv.DictReader = csv.DictReader(f)
+        # without a data column the first column holds the payload
+        column: str = "data" if "data" in (reader.fieldnames or []) else (reader.fieldnames or [None])[0]
+        
+        for row in reader:
+            yield {
+                "data": row.get(column) or "",
+                "name": row.get("name"),
+                "background": row.get("background"),
+            }
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    with open(path, encoding="utf8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+                
+            item = json.loads(line)
+            if isinstance(item, dict):
+                yield {
+                    "data": str(item.get("data", "")),
+                    "name": item.get("name"),
+                    "background": item.get("background"),
+                }
+            else:
+                yield {"data": str(item), "name": None, "background": None}
+
+def iter_rows(path: str) -> Iterator[Dict]:
+    rows: Iterator[Dict] = iter_jsonl(path) if path.lower().endswith((".jsonl", ".ndjson")) else iter_csv(path)
+    
+    for index, row in enumerate(rows):
+        row["index"] = index
+        yield row
+
+def generate_row(row: Dict) -> Tuple[Dict, bytes | None, str | None]:
+    from utils import GENERATORS
+    
+    try:
+        if not row["data"]:
+            raise ValueError("empty payload")
+            
+        generator = GENERATORS[_options["generator"]](row["data"], row["background"] or None, _options["size"])
+        return row, generator.export(_options["kind"]), None
+    except Exception as e:
+        return row, None, f"{type(e).__name__}: {e}"
+
+def generate_rows(rows: List[Dict]) -> List[Tuple[Dict, bytes | None, str | None]]:
+    return [generate_row(row) for row in rows]
+
+def run(rows: Iterable[Dict], options: Dict, workers: int = None, chunksize: int = 32, cache_dir: str = None) -> Iterator[Tuple[Dict, bytes | None, str | None]]:
+    workers = workers or os.cpu_count() or 1
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(options, cache_dir)) as executor:
+        for results in imap_bounded(executor, generate_rows, iter_chunks(rows, chunksize), workers * 2):
+            yield from results
+
+class Writer():
+    def __init__(self, output: str, kind: str) -> None:
+        self.kind: str = kind
+        self.names: Set[str] = set()
+        self.archive: zipfile.ZipFile = None
+        self.directory: str = None
+        
+        if output.lower().endswith(".zip"):
+            # png and gif are already compressed, compressing them again only costs time
+            compression: int = zipfile.ZIP_STORED if kind in ("png", "gif") else zipfile.ZIP_DEFLATED
+            self.archive = zipfile.ZipFile(output, "w", compression=compression)
+        else:
+            os.makedirs(output, exist_ok=True)
+            self.directory = output
+            
+    def filename(self, row: Dict) -> str:
+        name: str = re.sub(r"[^\w.-]+", "_", str(row["name"] or "")).strip("._") or f"{row['index']:06d}"
+        
+        filename: str = f"{name}.{self.kind}"
+        suffix: int = 1
+        while filename in self.names:
+            filename = f"{name}_{suffix}.{self.kind}"
+            suffix += 1
+            
+        self.names.add(filename)
+        return filename
+        
+    def write(self, row: Dict, data: bytes) -> str:
+        filename: str = self.filename(row)
+        
+        if self.archive is not None:
+            self.archive.writestr(filename, data)
+        else:
+            with open(os.path.join(self.directory, filename), "wb") as f:
+                f.write(data)
+                
+        return filename
+        
+    def close(self) -> None:
+        if self.archive is not None:
+            self.archive.close()
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m qrcode.generate", description="Generate QR codes for every row of a CSV or JSONL file.")
+    parser.add_argument("input", help="CSV with a data column (optional name and background) or JSONL with objects or strings")
+    parser.add_argument("-o", "--output", required=True, help="output directory, or a .zip file")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="png", help="output format (default: png)")
+    parser.add_argument("-s", "--size", type=int, default=800, help="size of the codes in pixels")
+    parser.add_argument("-g", "--generator", default="segno", help="generator to use (default: segno)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=32, help="rows handed to a worker at once")
+    parser.add_argument("--cache-dir", help="reuse codes generated by earlier runs from this directory")
+    args = parser.parse_args(argv)
+    
+    from utils import GENERATORS
+    if args.generator not in GENERATORS:
+        parser.error(f"unknown generator {args.generator!r}, choose from {', '.join(GENERATORS)}")
+        
+    options: Dict = {"generator": args.generator, "kind": args.format, "size": args.size}
+    
+    start: float = time.perf_counter()
+    stats: Dict[str, int] = {"rows": 0, "written": 0, "bytes": 0, "errors": 0}
+    writer: Writer = Writer(args.output, args.format)
+    
+    try:
+        for row, data, error in run(iter_rows(args.input), options, args.workers, max(args.chunksize, 1), args.cache_dir):
+            stats["rows"] += 1
+            
+            if error is not None:
+                stats["errors"] += 1
+                print(f"row {row['index']}: {error}", file=sys.stderr)
+                continue
+                
+            writer.write(row, data)
+            stats["written"] += 1
+            stats["bytes"] += len(data)
+    finally:
+        writer.close()
+        
+    elapsed: float = time.perf_counter() - start
+    rate: float = stats["rows"] / elapsed if elapsed else 0.0
+    print(f"{stats['written']} codes ({stats['bytes'] / 2 ** 20:.1f} MiB), {stats['errors']} errors in {elapsed:.2f}s ({rate:.1f} codes/s)", file=sys.stderr)
+    
+    return 1 if stats["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
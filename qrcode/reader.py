@@ -1,27 +1,59 @@
 import sys
 import os
+import time
 from pathlib import Path
 from urllib.parse import urlparse
 import webbrowser
 
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QPixmap, QCursor, QImage
-from PySide6.QtWidgets import QWidget, QLabel, QSizePolicy, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QApplication
-from PIL.ImageQt import ImageQt, fromqimage
-from PIL import Image
-import cv2
+from PySide6.QtCore import Qt, QRect, QPoint
+from PySide6.QtGui import QPixmap, QCursor, QImage, QScreen
+from PySide6.QtWidgets import QWidget, QLabel, QSizePolicy, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QApplication, QComboBox, QSpinBox, QFileDialog, QMessageBox
 import numpy as np
 
 from screenshot.tool import ScreenshotTool
+from utils import CachedDecoder, OpenCVDecoder
+from utils.scanner import TiledScanner
+from utils.imaging import qimage_to_array, to_array, to_qimage
+from utils.memory import checkpoint
+from utils.preview import PreviewLabel
+from utils.decoder import decode_in_worker, init_worker
+from utils.trace import record, span, traced
+from utils.worker import IsolatedRunner, TaskRunner
+from .watcher import RegionWatcher
 
 class QRCodeReaderMenu(QWidget):
-    def __init__(self, main = None):
+    # seconds a selection may take to decode before its worker process is killed
+    DECODE_TIMEOUT = 5.0
+    
+    def __init__(self, main = None, screenshot_tool = None):
         super(QRCodeReaderMenu, self).__init__()
         self.main_window = main
         
-        self.screenshot_tool = ScreenshotTool(outer=self.main_window, image_callback=self.update_qr_code)
+        self.screenshot_tool = screenshot_tool or ScreenshotTool(outer=self.main_window)
+        # a selection is expected to hold a code, so the slower stages are worth trying.
+        # They run in a separate process, which keeps the UI responsive and can be killed when a
+        # crop hangs the detector or a newer one arrives. Repeated crops of the same code are
+        # answered from the decode cache of that process.
+        self.decode_runner = IsolatedRunner(timeout=self.DECODE_TIMEOUT, initializer=init_worker, parent=self)
+        self.decode_runner.finished.connect(self.decoded)
+        self.decode_runner.failed.connect(self.decode_failed)
+        self.decoding = None
+        self.decode_started = 0.0
+        # tiles of an unchanged part of the screen are not decoded again
+        self.scanner = TiledScanner(decoder_factory=lambda: CachedDecoder(OpenCVDecoder()))
+        QApplication.instance().aboutToQuit.connect(self.shutdown_workers)
+        self.codes = []
         
-        self.qr_code_image_label = QLabel(self)
+        self.region = None
+        self.watcher = RegionWatcher(parent=self)
+        self.watcher.decoded.connect(self.update_watched)
+        
+        # videos are read on a thread, the frames themselves are decoded on a process pool
+        self.file_runner = TaskRunner(max_workers=1, parent=self)
+        self.file_runner.finished.connect(self.file_scanned)
+        self.file_runner.failed.connect(self.file_failed)
+        
+        self.qr_code_image_label = PreviewLabel(self)
         self.qr_code_image_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.qr_code_image_label.setAlignment(Qt.AlignCenter)
         
@@ -30,6 +62,11 @@ class QRCodeReaderMenu(QWidget):
         
         qr_code_text_layout = QHBoxLayout()
         
+        self.qr_code_select = QComboBox(self)
+        self.qr_code_select.setFixedWidth(100)
+        self.qr_code_select.setVisible(False)
+        self.qr_code_select.currentIndexChanged.connect(self.show_code)
+        
         self.qr_code_text_label = QTextEdit(self)
         self.qr_code_text_label.setReadOnly(True)
         self.qr_code_text_label.setMaximumHeight(30)
@@ -39,6 +76,7 @@ class QRCodeReaderMenu(QWidget):
         # self.qr_code_copy_button.setMaximumWidth(30)
         # self.qr_code_copy_button.setVisible(False)
         
+        qr_code_text_layout.addWidget(self.qr_code_select)
         qr_code_text_layout.addWidget(self.qr_code_text_label)
         # qr_code_text_layout.addWidget(self.qr_code_copy_button)
         
@@ -52,7 +90,33 @@ class QRCodeReaderMenu(QWidget):
         self.new.setMaximumWidth(80)
         self.new.clicked.connect(self.crop_qr)
         
+        self.scan = QPushButton("Scan Screens", self)
+        self.scan.setMaximumWidth(100)
+        self.scan.clicked.connect(self.scan_screens)
+        
+        self.watch = QPushButton("Watch", self)
+        self.watch.setMaximumWidth(80)
+        self.watch.setCheckable(True)
+        self.watch.setToolTip("Select an area which is re-captured and decoded whenever it changes")
+        self.watch.toggled.connect(self.toggle_watch)
+        
+        self.watch_interval = QSpinBox(self)
+        self.watch_interval.setRange(50, 10000)
+        self.watch_interval.setSingleStep(50)
+        self.watch_interval.setValue(500)
+        self.watch_interval.setSuffix(" ms")
+        self.watch_interval.valueChanged.connect(self.watcher.set_interval)
+        
+        self.scan_file_button = QPushButton("Scan Video", self)
+        self.scan_file_button.setMaximumWidth(100)
+        self.scan_file_button.setToolTip("Find every QR code in a video or an animated GIF/WebP")
+        self.scan_file_button.clicked.connect(self.scan_file)
+        
         buttons.addWidget(self.new)
+        buttons.addWidget(self.scan)
+        buttons.addWidget(self.scan_file_button)
+        buttons.addWidget(self.watch)
+        buttons.addWidget(self.watch_interval)
         
         main_layout.addLayout(buttons)
         
@@ -64,23 +128,160 @@ class QRCodeReaderMenu(QWidget):
             return False
         
     def crop_qr(self):
-        self.screenshot_tool.take_area_screenshot()
+        self.screenshot_tool.take_area_screenshot(self.update_qr_code, self.update_region)
+        
+    def update_region(self, screen: QScreen, region: QRect):
+        self.region = (screen, region)
+        
+        if self.watch.isChecked():
+            self.watcher.set_interval(self.watch_interval.value())
+            self.watcher.start(screen, region)
+            
+    def toggle_watch(self, checked):
+        if not checked:
+            self.watcher.stop()
+            return
+            
+        self.crop_qr()
+        
+    def update_watched(self, image, texts, boxes):
+        # keep the selected code if the frame changed but the codes did not
+        if [text for text in texts if text] == [text for text, _, _ in self.codes]:
+            return
+            
+        self.cancel_decode()
+        self.show_codes(texts, boxes, image=image)
+        
+    def scan_screens(self):
+        image = self.screenshot_tool.take_full_screenshot()
+        
+        texts, boxes = self.scanner.scan(to_array(image))
         
+        # the grab starts at the top left corner of the virtual desktop
+        origin = QApplication.primaryScreen().virtualGeometry().topLeft().toTuple()
+        self.cancel_decode()
+        self.show_codes(texts, boxes, origin, image=image)
+        
+    def scan_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Scan Video",
+            "",
+            "Videos and animations (*.mp4 *.mkv *.webm *.avi *.mov *.gif *.webp *.apng *.png);;All files (*)"
+        )
+        if not path:
+            return
+            
+        from .video import scan
+        
+        self.scan_file_button.setEnabled(False)
+        self.scan_file_button.setText("Scanning...")
+        self.file_runner.submit(scan, path, crops=True)
+        
+    def file_scanned(self, generation, result):
+        self.scan_file_button.setEnabled(True)
+        self.scan_file_button.setText("Scan Video")
+        self.cancel_decode()
+        
+        codes, _ = result
+        if not codes:
+            self.show_codes([], [])
+            return
+            
+        # the crops of the first sighting are stacked, so every code can be shown from one image
+        gap = 8
+        width = max(code["image"].shape[1] for code in codes)
+        strip = np.full((sum(code["image"].shape[0] + gap for code in codes), width), 255, dtype=np.uint8)
+        
+        boxes = []
+        y = 0
+        for code in codes:
+            height, code_width = code["image"].shape
+            strip[y:y + height, :code_width] = code["image"]
+            boxes.append([(0, y), (code_width, y), (code_width, y + height), (0, y + height)])
+            y += height + gap
+            
+        self.show_codes(
+            [code["text"] for code in codes],
+            boxes,
+            details=[f"seen from {self.timestamp(code['first'])} to {self.timestamp(code['last'])}" for code in codes],
+            image=strip
+        )
+        
+    def file_failed(self, generation, error):
+        self.scan_file_button.setEnabled(True)
+        self.scan_file_button.setText("Scan Video")
+        
+        QMessageBox.warning(self, "Scan Video", f"The file could not be scanned: {error}")
+        
+    @staticmethod
+    def timestamp(seconds):
+        minutes, seconds = divmod(seconds, 60)
+        return f"{int(minutes)}:{seconds:04.1f}"
+        
+    @traced("reader.update_qr_code")
     def update_qr_code(self, img):
-        if isinstance(img, QImage):
-            img = fromqimage(img)
+        with span("reader.convert"):
+            img = to_qimage(img)
+            
+        # the selection is shown right away, the codes follow once the worker has read them
+        self.decoding = img
+        self.decode_started = time.perf_counter()
+        self.set_pixmap(img)
+        self.qr_code_select.setVisible(False)
+        self.qr_code_text_label.setText("Decoding...")
+        self.qr_code_text_label.setVisible(True)
+        
+        # the pixels are sent from a view of the QImage, a newer selection cancels this one
+        self.decode_runner.submit(decode_in_worker, qimage_to_array(img))
         
-        self.image = img
+    def decoded(self, generation, result):
+        texts, boxes, stage = result
+        record("reader.decode", self.decode_started, time.perf_counter(), width=self.decoding.width(), height=self.decoding.height(), stage=stage)
         
-        decoder = cv2.QRCodeDetector()
-        retval, info, bboxes, codes = decoder.detectAndDecodeMulti(np.array(img))
+        image, self.decoding = self.decoding, None
+        with span("reader.show"):
+            self.show_codes(texts, boxes, image=image)
+            checkpoint("reader.decoded")
+            
+    def decode_failed(self, generation, error):
+        self.decoding = None
+        self.show_codes([], [])
+        
+        self.qr_code_text_label.setText(f"The selection could not be decoded: {error}")
+        self.qr_code_text_label.setVisible(True)
         
-        if not retval:            
+    def shutdown_workers(self):
+        # the worker processes and the scanner threads do not outlive the application
+        self.decode_runner.shutdown()
+        self.scanner.close()
+        
+    def cancel_decode(self):
+        # codes shown by another path must not be replaced by a selection that is still decoding
+        self.decode_runner.cancel()
+        self.decoding = None
+        
+    def show_codes(self, texts, boxes, origin = (0, 0), details = None, image = None):
+        entries = [(text, box, detail) for text, box, detail in zip(texts, boxes, details or [None] * len(texts)) if text]
+        # only the codes are cut out and kept, the capture they were found in is not held on to
+        image = to_qimage(image) if entries else None
+        self.codes = [(text, box, self.crop(image, box)) for text, box, _ in entries]
+        
+        self.qr_code_select.blockSignals(True)
+        self.qr_code_select.clear()
+        for index, (text, box, detail) in enumerate(entries, 1):
+            x, y = min(p[0] for p in box) + origin[0], min(p[1] for p in box) + origin[1]
+            self.qr_code_select.addItem(f"Code {index}")
+            self.qr_code_select.setItemData(index - 1, f"{text}\n{detail or f'at ({int(x)}, {int(y)})'}", Qt.ItemDataRole.ToolTipRole)
+        self.qr_code_select.blockSignals(False)
+        self.qr_code_select.setVisible(len(self.codes) > 1)
+        
+        if not self.codes:
             if getattr(sys, 'frozen', False):
                 path = os.path.join(sys._MEIPASS, "files/no_qr_code.png")
             else:
                 path = f"{Path(__file__).resolve().parent.parent}/static/no_qr_code.png"
-            no_qr = Image.open(f"{path}")
+            no_qr = QImage(f"{path}")
             
             self.set_pixmap(no_qr)
             
@@ -90,30 +291,37 @@ class QRCodeReaderMenu(QWidget):
             
             return
         
-        img = cv2.cvtColor(np.array(self.image), cv2.COLOR_BGR2RGB)
+        self.show_code(0)
+        
+    def show_code(self, index):
+        if not 0 <= index < len(self.codes):
+            return
         
-        # currently only one qr code supported
-        index = 0
+        text, _, image = self.codes[index]
         
-        self.qr_code_text_label.setText(info[index])
+        self.qr_code_text_label.setText(text)
         self.qr_code_text_label.mousePressEvent = self.copy_link
         self.qr_code_text_label.setVisible(True)
         # self.qr_code_copy_button.setVisible(True)
         
-        top_left = (int(bboxes[index][0][0]), int(bboxes[index][0][1]))
-        bottom_right = (int(bboxes[index][2][0]), int(bboxes[index][2][1]))
-        
-        img = img[top_left[1]:bottom_right[1], top_left[0]:bottom_right[0]]
-        image = Image.fromarray(img)
         self.set_pixmap(image)
         
-        if not self.uri_validator(info[index]):
+        if not self.uri_validator(text):
             self.qr_code_image_label.setCursor(QCursor(Qt.CursorShape.ForbiddenCursor))
             return
         
         self.qr_code_image_label.mouseDoubleClickEvent = self.open_link
         self.qr_code_image_label.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
         
+    @staticmethod
+    def crop(image, box):
+        # the bounding rect also covers rotated codes
+        top_left = (max(int(min(p[0] for p in box)), 0), max(int(min(p[1] for p in box)), 0))
+        bottom_right = (int(max(p[0] for p in box)), int(max(p[1] for p in box)))
+        
+        # copy detaches from the capture, so it can be freed
+        return image.copy(QRect(QPoint(*top_left), QPoint(*bottom_right)))
+        
     def open_link(self, event):       
         text = self.qr_code_text_label.toPlainText()
         
@@ -129,14 +337,5 @@ class QRCodeReaderMenu(QWidget):
         clipboard.setText(text)
              
     def set_pixmap(self, img):
-        image = ImageQt(img)
-        pixmap = QPixmap.fromImage(image)
-            
-        self.qr_code_image_label.setPixmap(
-            pixmap.scaled(
-                self.qr_code_image_label.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-        )
+        self.qr_code_image_label.set_image(to_qimage(img))
  
\ No newline at end of file
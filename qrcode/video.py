@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+from utils import DECODERS
+from utils.decoder import Box, CachedDecoder, QRCodeDecoder
+from utils.pool import imap_bounded
+
+# animated formats read frame by frame through PIL, everything else goes to cv2.VideoCapture
+ANIMATED_SUFFIXES = (".gif", ".webp", ".png", ".apng")
+
+# first and last timestamp in seconds of a run of unchanged frames, and its first frame
+Segment = Tuple[float, float, np.ndarray]
+
+# one decoder per worker process, created by the pool initializer
+_decoder: QRCodeDecoder = None
+_crops: bool = False
+
+def init_worker(decoder: str = "cascade", crops: bool = False) -> None:
+    global _decoder, _crops
+    
+    # the pool already runs one process per core, nested threads only compete with it
+    cv2.setNumThreads(1)
+    # recordings show the same code again and again, the cache answers the repeats
+    _decoder = CachedDecoder(DECODERS[decoder]())
+    _crops = crops
+
+def iter_animated(path: str, wanted: Callable[[float], bool]) -> Iterator[Tuple[float, np.ndarray]]:
+    from PIL import Image, ImageSequence
+    
+    with Image.open(path) as image:
+        timestamp: float = 0.0
+        # frames are decoded one after another, only the current one is held in memory
+        for frame in ImageSequence.Iterator(image):
+            if wanted(timestamp):
+                yield timestamp, np.asarray(frame.convert("L"))
+                
+            timestamp += frame.info.get("duration", 100) / 1000
+
+def iter_video(path: str, wanted: Callable[[float], bool]) -> Iterator[Tuple[float, np.ndarray]]:
+    capture: cv2.VideoCapture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("unsupported or corrupt video")
+        
+    fps: float = capture.get(cv2.CAP_PROP_FPS)
+    index: int = 0
+    try:
+        # grab only demuxes and decodes, the colour conversion is left to the frames that are kept
+        while capture.grab():
+            timestamp: float = index / fps if fps > 0 else capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            index += 1
+            
+            if not wanted(timestamp):
+                continue
+                
+            ok, frame = capture.retrieve()
+            if ok:
+                yield timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    finally:
+        capture.release()
+
+def iter_frames(path: str, wanted: Callable[[float], bool]) -> Iterator[Tuple[float, np.ndarray]]:
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+        
+    if path.lower().endswith(ANIMATED_SUFFIXES):
+        return iter_animated(path, wanted)
+        
+    return iter_video(path, wanted)
+
+class Sampler():
+    # samples densely while the picture changes and backs off while it stands still
+    def __init__(self, min_interval: float = 0.1, max_interval: float = 0.4, threshold: float = 0.001, delta: int = 32) -> None:
+        self.min_interval: float = min_interval
+        # upper bound for how long a code can be on screen without being sampled
+        self.max_interval: float = max_interval
+        # a frame counts as changed when more than this fraction of the thumbnail pixels moved by more
+        # than delta (0-255). A mean over the frame would drown a code appearing on a large screen.
+        self.threshold: float = threshold
+        self.delta: int = delta
+        
+        self.interval: float = min_interval
+        self.next: float = 0.0
+        self._signature: np.ndarray = None
+        
+        self.read: int = 0
+        self.sampled: int = 0
+        
+    def wanted(self, timestamp: float) -> bool:
+        self.read += 1
+        return timestamp >= self.next
+        
+    def changed(self, timestamp: float, frame: np.ndarray) -> bool:
+        self.sampled += 1
+        signature: np.ndarray = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA)
+        
+        # compared with the first frame of the segment, so a slow drift is noticed as well
+        changed: bool = self._signature is None or np.count_nonzero(cv2.absdiff(signature, self._signature) > self.delta) > self.threshold * signature.size
+        if changed:
+            self._signature = signature
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+            
+        self.next = timestamp + self.interval
+        return changed
+
+def iter_segments(path: str, sampler: Sampler) -> Iterator[Segment]:
+    # only the first frame of the current segment is kept, whatever the length of the file
+    current: List = None
+    for timestamp, frame in iter_frames(path, sampler.wanted):
+        if sampler.changed(timestamp, frame):
+            if current is not None:
+                yield tuple(current)
+            current = [timestamp, timestamp, frame]
+        else:
+            current[1] = timestamp
+            
+    if current is not None:
+        yield tuple(current)
+
+def crop(frame: np.ndarray, box: Box) -> np.ndarray:
+    points: np.ndarray = np.array(box)
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    
+    margin: float = max(x2 - x1, y2 - y1) * 0.1
+    x1, y1 = max(int(x1 - margin), 0), max(int(y1 - margin), 0)
+    x2, y2 = int(x2 + margin) + 1, int(y2 + margin) + 1
+    
+    return np.ascontiguousarray(frame[y1:y2, x1:x2])
+
+def decode_segment(segment: Segment) -> Tuple[float, float, List[Tuple[str, np.ndarray | None]]]:
+    global _decoder
+    if _decoder is None:
+        init_worker()
+        
+    first, last, frame = segment
+    texts, boxes = _decoder.decode(frame)
+    
+    return first, last, [(text, crop(frame, box) if _crops else None) for text, box in zip(texts, boxes) if text]
+
+def scan(path: str, workers: int = None, decoder: str = "cascade", sampler: Sampler = None, crops: bool = False, progress: Callable[[float], None] = None) -> Tuple[List[Dict], Dict]:
+    workers = workers or os.cpu_count() or 1
+    sampler = sampler or Sampler()
+    
+    codes: Dict[str, Dict] = {}
+    segments: int = 0
+    start: float = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(decoder, crops)) as executor:
+        # the window bounds the frames in flight, so memory stays flat for hour long recordings
+        for first, last, found in imap_bounded(executor, decode_segment, iter_segments(path, sampler), workers * 2):
+            segments += 1
+            if progress is not None:
+                progress(last)
+                
+            for text, image in found:
+                code: Dict = codes.get(text)
+                if code is None:
+                    codes[text] = {"text": text, "first": first, "last": last, "segments": 1, "image": image}
+                    continue
+                    
+                # segments finish in any order, the earliest sighting keeps its crop
+                if first < code["first"]:
+                    code["first"], code["image"] = first, image if image is not None else code["image"]
+                code["last"] = max(code["last"], last)
+                code["segments"] += 1
+                
+    stats: Dict = {
+        "frames": sampler.read,
+        "sampled": sampler.sampled,
+        "decoded": segments,
+        "codes": len(codes),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    
+    return sorted(codes.values(), key=lambda code: code["first"]), stats
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m qrcode.video", description="Find every distinct QR code in a video or an animated GIF/WebP and write it as JSONL with the first and last time it is visible.")
+    parser.add_argument("path", help="video file or animated image")
+    parser.add_argument("-o", "--output", help="write JSONL to this file instead of stdout")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("-d", "--decoder", choices=list(DECODERS), default="cascade", help="decoder engine (default: cascade)")
+    parser.add_argument("--min-interval", type=float, default=0.1, help="seconds between samples while the picture changes")
+    parser.add_argument("--max-interval", type=float, default=0.4, help="seconds between samples while the picture stands still, shorter sightings may be missed")
+    parser.add_argument("--threshold", type=float, default=0.001, help="fraction of changed thumbnail pixels that counts as a change")
+    args = parser.parse_args(argv)
+    
+    sampler: Sampler = Sampler(args.min_interval, max(args.max_interval, args.min_interval), args.threshold)
+    try:
+        codes, stats = scan(args.path, args.workers, args.decoder, sampler)
+    except (OSError, ValueError) as e:
+        print(f"{args.path}: {e}", file=sys.stderr)
+        return 1
+        
+    lines: List[str] = [json.dumps({key: value for key, value in code.items() if key != "image"}, ensure_ascii=False) for code in codes]
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as out:
+            out.write("".join(line + "\n" for line in lines))
+    else:
+        sys.stdout.write("".join(line + "\n" for line in lines))
+        
+    rate: float = stats["frames"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"{stats['frames']} frames, {stats['sampled']} sampled, {stats['decoded']} decoded, {stats['codes']} codes in {stats['seconds']:.2f}s ({rate:.1f} frames/s)", file=sys.stderr)
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from typing import Callable, List, Tuple
+
+from PySide6.QtCore import Qt, QObject, QRect, QTimer, Signal
+from PySide6.QtGui import QImage, QPixmap, QScreen
+import numpy as np
+
+from utils import CachedDecoder, OpenCVDecoder, QRCodeDecoder
+from utils.imaging import qimage_to_array
+from utils.worker import TaskRunner
+
+class RegionWatcher(QObject):
+    decoded = Signal(object, list, list)
+    
+    def __init__(self, decoder_factory: Callable[[], QRCodeDecoder] = OpenCVDecoder, interval: int = 500, threshold: float = 2.0, parent: QObject = None) -> None:
+        super(RegionWatcher, self).__init__(parent)
+        
+        # codes that rotate through a fixed set are only decoded the first time
+        self.decoder: QRCodeDecoder = CachedDecoder(decoder_factory())
+        # mean absolute difference (0-255) of the thumbnails above which a frame counts as changed
+        self.threshold: float = threshold
+        
+        self.screen: QScreen = None
+        self.region: QRect = None
+        self._signature: np.ndarray = None
+        
+        self.timer: QTimer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.capture)
+        
+        # a single worker, so the decoder is never used concurrently
+        self.runner: TaskRunner = TaskRunner(max_workers=1, parent=self)
+        self.runner.finished.connect(self._decoded)
+        
+        self.frames: int = 0
+        self.skipped: int = 0
+        
+    @property
+    def active(self) -> bool:
+        return self.timer.isActive()
+        
+    def set_interval(self, interval: int) -> None:
+        self.timer.setInterval(interval)
+        
+    def start(self, screen: QScreen, region: QRect) -> None:
+        self.screen = screen
+        self.region = QRect(region)
+        self._signature = None
+        self.frames = self.skipped = 0
+        
+        self.timer.start()
+        self.capture()
+        
+    def stop(self) -> None:
+        self.timer.stop()
+        self._signature = None
+        
+    @staticmethod
+    def signature(image: QImage, size: int = 32) -> np.ndarray:
+        thumb: QImage = image.scaled(size, size, Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        thumb = thumb.convertToFormat(QImage.Format.Format_Grayscale8)
+        
+        return qimage_to_array(thumb).astype(np.int16)
+        
+    def changed(self, signature: np.ndarray) -> bool:
+        if self._signature is None:
+            return True
+            
+        return float(np.abs(signature - self._signature).mean()) > self.threshold
+        
+    def capture(self) -> None:
+        if self.screen is None or self.region.isEmpty():
+            return
+            
+        self.frames += 1
+        
+        # the previous frame is still decoding, the next tick compares against the last decoded one
+        if self.runner.busy:
+            self.skipped += 1
+            return
+            
+        x, y, w, h = self.region.getRect()
+        pixmap: QPixmap = self.screen.grabWindow(0, x, y, w, h)
+        image: QImage = pixmap.toImage()
+        
+        signature: np.ndarray = self.signature(image)
+        if not self.changed(signature):
+            self.skipped += 1
+            return
+            
+        self._signature = signature
+        self.runner.submit(self.decode, image)
+        
+    def decode(self, image: QImage) -> Tuple[QImage, List[str], List]:
+        texts, boxes = self.decoder.decode(qimage_to_array(image))
+        
+        return image, texts, boxes
+        
+    def _decoded(self, generation: int, result: Tuple[QImage, List[str], List]) -> None:
+        if not self.active:
+            return
+            
+        self.decoded.emit(*result)
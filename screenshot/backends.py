@@ -0,0 +1,386 @@
+import ctypes
+import ctypes.util
+import math
+import os
+import sys
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Type
+
+from PySide6.QtCore import Qt, QPoint, QRect, QSize
+from PySide6.QtGui import QColor, QFont, QGuiApplication, QImage, QPainter, QPixmap, QScreen
+import numpy as np
+
+from utils.imaging import pil_to_qimage, qimage_to_array
+
+# formats whose bytes are BGRA/BGRX in memory and can be copied into the canvas as they are
+BGRA_FORMATS: Tuple[QImage.Format, ...] = (
+    QImage.Format.Format_RGB32,
+    QImage.Format.Format_ARGB32,
+    QImage.Format.Format_ARGB32_Premultiplied,
+)
+
+def layout(screens: List[QScreen]) -> Tuple[QRect, float]:
+    # the canvas spans the bounding rect of the screens, in device pixels when all
+    # screens share a scale factor and in logical pixels when they do not
+    bounds: QRect = QRect()
+    for screen in screens:
+        bounds = bounds.united(screen.geometry())
+        
+    ratios = {screen.devicePixelRatio() for screen in screens}
+    scale: float = ratios.pop() if len(ratios) == 1 else 1.0
+    
+    return bounds, scale
+
+def device_rect(rect: QRect, origin: QPoint, scale: float) -> QRect:
+    return QRect(
+        round((rect.x() - origin.x()) * scale),
+        round((rect.y() - origin.y()) * scale),
+        math.ceil(rect.width() * scale),
+        math.ceil(rect.height() * scale)
+    )
+
+class CaptureBackend(ABC):
+    name: str = None
+    
+    @classmethod
+    def available(cls) -> bool:
+        return True
+        
+    @abstractmethod
+    def grab(self, screens: List[QScreen]) -> QImage:
+        pass
+        
+    def close(self) -> None:
+        pass
+
+class QtBackend(CaptureBackend):
+    name = "qt"
+    
+    def __init__(self) -> None:
+        self.executor: ThreadPoolExecutor = None
+        
+    @classmethod
+    def available(cls) -> bool:
+        return QGuiApplication.instance() is not None
+        
+    @staticmethod
+    def blit(canvas: np.ndarray, image: QImage, target: QRect) -> None:
+        target = target.intersected(QRect(0, 0, canvas.shape[1], canvas.shape[0]))
+        x, y, w, h = target.getRect()
+        
+        canvas[y:y + h, x:x + w] = qimage_to_array(image)[:h, :w]
+        
+    def grab(self, screens: List[QScreen]) -> QImage:
+        # grabs have to happen on the GUI thread, so they run one after another
+        images: List[QImage] = [screen.grabWindow(0).toImage() for screen in screens]
+        if len(images) == 1:
+            return images[0]
+            
+        bounds, scale = layout(screens)
+        size: QSize = device_rect(bounds, bounds.topLeft(), scale).size()
+        
+        # one buffer for the whole desktop, every screen is copied into it once
+        canvas: np.ndarray = np.zeros((size.height(), size.width(), 4), dtype=np.uint8)
+        
+        tasks: List[Tuple[QImage, QRect]] = []
+        for screen, image in zip(screens, images):
+            target: QRect = device_rect(screen.geometry(), bounds.topLeft(), scale)
+            
+            if image.size() != target.size():
+                image = image.scaled(target.size(), Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            if image.format() not in BGRA_FORMATS:
+                image = image.convertToFormat(QImage.Format.Format_RGB32)
+                
+            tasks.append((image, target))
+            
+        # the copies release the GIL, each screen is blitted on its own thread
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(thread_name_prefix="capture")
+        for future in [self.executor.submit(self.blit, canvas, image, target) for image, target in tasks]:
+            future.result()
+            
+        # QImage keeps a reference to the canvas, the pixels are not copied again
+        return QImage(canvas.data, size.width(), size.height(), canvas.strides[0], QImage.Format.Format_RGB32)
+        
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+class XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+        ("obdata", ctypes.c_void_p),
+        ("funcs", ctypes.c_void_p * 6),
+    ]
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+class XShmSegment():
+    # a shared memory XImage of a fixed size, the X server writes the pixels
+    # straight into it without going through the socket
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+    ZPixmap = 2
+    
+    def __init__(self, backend: "XShmBackend", width: int, height: int) -> None:
+        self.backend: XShmBackend = backend
+        x11, xext, libc = backend.x11, backend.xext, backend.libc
+        display = backend.display
+        
+        self.info: XShmSegmentInfo = XShmSegmentInfo()
+        self.image = xext.XShmCreateImage(display, backend.visual, backend.depth, self.ZPixmap, None, ctypes.byref(self.info), width, height)
+        if not self.image:
+            raise OSError("XShmCreateImage failed")
+            
+        size: int = self.image.contents.bytes_per_line * height
+        self.info.shmid = libc.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if self.info.shmid < 0:
+            raise OSError("shmget failed")
+            
+        address = libc.shmat(self.info.shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            libc.shmctl(self.info.shmid, self.IPC_RMID, None)
+            raise OSError("shmat failed")
+            
+        self.info.shmaddr = address
+        self.info.readOnly = 0
+        self.image.contents.data = address
+        
+        xext.XShmAttach(display, ctypes.byref(self.info))
+        x11.XSync(display, 0)
+        # marked for removal right away, the kernel frees it once both sides detached
+        libc.shmctl(self.info.shmid, self.IPC_RMID, None)
+        
+        self.array: np.ndarray = np.ctypeslib.as_array((ctypes.c_ubyte * size).from_address(address)).reshape(height, -1)
+        
+    def grab(self, x: int, y: int) -> np.ndarray:
+        if not self.backend.xext.XShmGetImage(self.backend.display, self.backend.root, self.image, x, y, ctypes.c_ulong(-1).value):
+            raise OSError("XShmGetImage failed")
+            
+        return self.array
+        
+    def close(self) -> None:
+        self.backend.xext.XShmDetach(self.backend.display, ctypes.byref(self.info))
+        # XDestroyImage would free the data pointer, which belongs to the segment
+        self.image.contents.data = None
+        self.backend.x11.XDestroyImage(self.image)
+        self.backend.libc.shmdt(ctypes.c_void_p(self.info.shmaddr))
+
+class XShmBackend(CaptureBackend):
+    name = "xshm"
+    
+    def __init__(self) -> None:
+        self.x11, self.xext, self.libc = self.libraries()
+        
+        self.display = self.x11.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("can not open the X display")
+            
+        screen: int = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XDefaultRootWindow(self.display)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth: int = self.x11.XDefaultDepth(self.display, screen)
+        # the segment is reused while the requested size stays the same
+        self.segment: XShmSegment = None
+        
+    @staticmethod
+    def libraries() -> Tuple[ctypes.CDLL, ctypes.CDLL, ctypes.CDLL]:
+        x11 = ctypes.CDLL(ctypes.util.find_library("X11"))
+        xext = ctypes.CDLL(ctypes.util.find_library("Xext"))
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_char_p, ctypes.POINTER(XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage), ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        
+        return x11, xext, libc
+        
+    @classmethod
+    def available(cls) -> bool:
+        app: QGuiApplication = QGuiApplication.instance()
+        if not sys.platform.startswith("linux") or app is None or app.platformName() != "xcb":
+            return False
+            
+        if not all(ctypes.util.find_library(name) for name in ("X11", "Xext")):
+            return False
+            
+        try:
+            x11, xext, _ = cls.libraries()
+        except OSError:
+            return False
+            
+        display = x11.XOpenDisplay(None)
+        if not display:
+            return False
+            
+        try:
+            # 32 bit visuals only, the pixels are handed on as RGB32
+            return bool(xext.XShmQueryExtension(display)) and x11.XDefaultDepth(display, x11.XDefaultScreen(display)) in (24, 32)
+        finally:
+            x11.XCloseDisplay(display)
+            
+    def grab(self, screens: List[QScreen]) -> QImage:
+        bounds, scale = layout(screens)
+        # X11 coordinates are device pixels relative to the root window
+        rect: QRect = device_rect(bounds, QPoint(0, 0), scale)
+        
+        if self.segment is None or (self.segment.image.contents.width, self.segment.image.contents.height) != (rect.width(), rect.height()):
+            if self.segment is not None:
+                self.segment.close()
+            self.segment = XShmSegment(self, rect.width(), rect.height())
+            
+        pixels: np.ndarray = self.segment.grab(rect.x(), rect.y())
+        
+        # the segment is overwritten by the next grab, this is the only copy
+        return QImage(self.segment.array.data, rect.width(), rect.height(), pixels.strides[0], QImage.Format.Format_RGB32).copy()
+        
+    def close(self) -> None:
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+            
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+class PILBackend(CaptureBackend):
+    name = "pil"
+    
+    @classmethod
+    def available(cls) -> bool:
+        if sys.platform in ("win32", "darwin"):
+            return True
+            
+        from PIL import features
+        return bool(features.check("xcb")) and bool(os.environ.get("DISPLAY"))
+        
+    def grab(self, screens: List[QScreen]) -> QImage:
+        from PIL import ImageGrab
+        
+        image: QImage = pil_to_qimage(ImageGrab.grab(bbox=None, all_screens=True))
+        
+        bounds, scale = layout(screens)
+        virtual: QRect = screens[0].virtualGeometry()
+        rect: QRect = device_rect(bounds, virtual.topLeft(), scale)
+        
+        return image if rect == image.rect() else image.copy(rect)
+
+class SyntheticScreen():
+    # stands in for a QScreen in tests and benchmarks, grabs return a generated frame
+    def __init__(self, geometry: QRect, device_pixel_ratio: float = 1.0, name: str = "synthetic") -> None:
+        self._geometry: QRect = QRect(geometry)
+        self._ratio: float = device_pixel_ratio
+        self._name: str = name
+        self._pixmap: QPixmap = None
+        
+    def geometry(self) -> QRect:
+        return self._geometry
+        
+    def devicePixelRatio(self) -> float:
+        return self._ratio
+        
+    def name(self) -> str:
+        return self._name
+        
+    def frame(self) -> QImage:
+        size: QSize = device_rect(self._geometry, self._geometry.topLeft(), self._ratio).size()
+        image: QImage = QImage(size, QImage.Format.Format_RGB32)
+        image.fill(QColor(235, 235, 235))
+        
+        painter: QPainter = QPainter(image)
+        painter.fillRect(QRect(0, 0, size.width(), 40), QColor(45, 45, 48))
+        painter.setPen(Qt.GlobalColor.black)
+        painter.setFont(QFont("Sans", 24))
+        painter.drawText(QRect(QPoint(0, 0), size), Qt.AlignmentFlag.AlignCenter, f"{self._name} {self._geometry.x()},{self._geometry.y()}")
+        painter.end()
+        
+        return image
+        
+    def grabWindow(self, window: int = 0, x: int = 0, y: int = 0, width: int = -1, height: int = -1) -> QPixmap:
+        if self._pixmap is None:
+            self._pixmap = QPixmap.fromImage(self.frame())
+            
+        if (x, y, width, height) == (0, 0, -1, -1):
+            return self._pixmap
+            
+        return self._pixmap.copy(x, y, width if width >= 0 else self._pixmap.width() - x, height if height >= 0 else self._pixmap.height() - y)
+
+class SyntheticBackend(CaptureBackend):
+    name = "synthetic"
+    
+    def grab(self, screens: List[QScreen]) -> QImage:
+        bounds, scale = layout(screens)
+        image: QImage = QImage(device_rect(bounds, bounds.topLeft(), scale).size(), QImage.Format.Format_RGB32)
+        image.fill(Qt.GlobalColor.black)
+        
+        painter: QPainter = QPainter(image)
+        for screen in screens:
+            frame: QImage = screen.frame() if isinstance(screen, SyntheticScreen) else SyntheticScreen(screen.geometry(), scale, screen.name()).frame()
+            painter.drawImage(device_rect(screen.geometry(), bounds.topLeft(), scale), frame)
+        painter.end()
+        
+        return image
+
+# in order of preference, the first available one is used
+BACKENDS: Dict[str, Type[CaptureBackend]] = {
+    backend.name: backend for backend in (XShmBackend, QtBackend, PILBackend, SyntheticBackend)
+}
+
+def select_backend(name: str = None) -> CaptureBackend:
+    name = name or os.environ.get("SNIPPINGPANDA_CAPTURE")
+    if name:
+        return BACKENDS[name]()
+        
+    for backend in BACKENDS.values():
+        if backend is SyntheticBackend or not backend.available():
+            continue
+        try:
+            return backend()
+        except OSError:
+            continue
+            
+    return SyntheticBackend()
@@ -5,16 +5,20 @@ from PySide6.QtWidgets import QWidget, QApplication
 from PySide6.QtGui import QKeyEvent, QMouseEvent, QPaintEvent, QPainter, QColor, QPen, QPixmap, QScreen, QImage
 
 from utils import no_callback
+from utils.memory import checkpoint
+from utils.trace import span, traced
 
 class ScreenHandler(QWidget):
-    def __init__(self, screen: QScreen = None, image_callback: Callable = no_callback, release_event: Callable = no_callback) -> None:
+    def __init__(self, screen: QScreen = None, image_callback: Callable = no_callback, release_event: Callable = no_callback, region_callback: Callable = no_callback) -> None:
         super(ScreenHandler, self).__init__()
         
         self.setScreen(screen)
         self.setGeometry(screen.geometry())
         
         self._pixmap: QPixmap = None
-        self._image: QImage = None
+        self._dimmed: QPixmap = None
+        self._opacity: int = None
+        self._line_width: int = 3
         
         self.top_left: QPoint = self.mapToGlobal(QPoint(0, 0))
         self.bottom_right: QPoint = self.mapToGlobal(QPoint(1920, 1080))
@@ -26,6 +30,7 @@ class ScreenHandler(QWidget):
         self.end: QPointF = QPointF()
         self.snipping: bool = False
         self._image_callback: Callable = image_callback
+        self._region_callback: Callable = region_callback
         self._release: Callable = release_event
         
     def getRect(self) -> Tuple[int, int, int, int]:
@@ -60,11 +65,43 @@ class ScreenHandler(QWidget):
         
         return (x1, y1), (x2, y2)
         
+    def set_screenshot(self, pixmap: QPixmap) -> None:
+        # kept as a pixmap, only the selected part is converted to a QImage on release
+        self._pixmap = pixmap
+        
+        # the dimmed background only changes with the capture, so it is composited once here
+        self._dimmed = QPixmap(pixmap)
+        painter: QPainter = QPainter(self._dimmed)
+        painter.fillRect(self._dimmed.rect(), QColor(0, 0, 0, 90))
+        painter.end()
+        
+    def clear_screenshot(self) -> None:
+        self._pixmap = None
+        self._dimmed = None
+        
+    def source_rect(self, rect: QRectF) -> QRectF:
+        # widget coordinates are logical, the captured pixmap is in device pixels
+        sx: float = self._pixmap.width() / max(self.width(), 1)
+        sy: float = self._pixmap.height() / max(self.height(), 1)
+        
+        return QRectF(rect.x() * sx, rect.y() * sy, rect.width() * sx, rect.height() * sy)
+        
+    def selection_rect(self) -> QRect:
+        if not self.snipping:
+            return QRect()
+            
+        # grown by the pen width, so the border is part of the repainted area
+        lw: int = self._line_width
+        return QRectF(self.begin, self.end).normalized().toAlignedRect().adjusted(-lw, -lw, lw, lw)
+        
+    def update_selection(self, previous: QRect) -> None:
+        self.update(previous.united(self.selection_rect()))
+        
     def paintEvent(self, event: QPaintEvent) -> None:
         if self.snipping:
             # color of the inner rect
             color = (255, 255, 255, 25)
-            lw = 3
+            lw = self._line_width
             opacity = 1
         else:
             self.begin = QPointF()
@@ -73,14 +110,17 @@ class ScreenHandler(QWidget):
             lw = 0
             opacity = 0        
         
-        self.setWindowOpacity(opacity)
-        
-        white_layer: QPixmap = QPixmap(self.screen_width, self.screen_height)
-        white_layer.fill(QColor(0, 0, 0, 90))
+        if opacity != self._opacity:
+            self._opacity = opacity
+            self.setWindowOpacity(opacity)
+            
+        if self._pixmap is None:
+            return
+            
+        dirty: QRectF = QRectF(event.rect())
         
         painter: QPainter = QPainter(self)
-        painter.drawPixmap(self.rect(), self._pixmap)
-        painter.drawPixmap(self.rect(), white_layer)
+        painter.drawPixmap(dirty, self._dimmed, self.source_rect(dirty))
         painter.setPen(QPen(QColor('white'), lw))
         painter.setBrush(QColor(*color))
         rect: QRectF = QRectF(self.begin, self.end)
@@ -88,9 +128,10 @@ class ScreenHandler(QWidget):
         painter.drawRect(rect)
         
         p1, p2 = self.determine_true_corners(rect.topLeft(), rect.bottomRight())             
-        paint_rect: QRect = QRect(QPoint(*p1), QPoint(*p2))
+        paint_rect: QRectF = QRectF(QPointF(*p1), QPointF(*p2)).intersected(dirty)
         
-        painter.drawPixmap(paint_rect, self._pixmap.copy(paint_rect))
+        if not paint_rect.isEmpty():
+            painter.drawPixmap(paint_rect, self._pixmap, self.source_rect(paint_rect))
         
     def keyPressEvent(self, event: QKeyEvent) -> None:
         if event.key() == Qt.Key.Key_Escape:
@@ -100,16 +141,21 @@ class ScreenHandler(QWidget):
         event.accept()
         
     def mousePressEvent(self, event: QMouseEvent) -> None:
+        previous: QRect = self.selection_rect()
+        
         self.begin: QPointF = event.scenePosition()
         self.end: QPointF = self.begin
         
-        self.update()
+        self.update_selection(previous)
         
     def mouseMoveEvent(self, event: QMouseEvent) -> None:
+        previous: QRect = self.selection_rect()
+        
         self.begin: QPointF = event.scenePosition()
         
-        self.update()
+        self.update_selection(previous)
         
+    @traced("screenshot.release")
     def mouseReleaseEvent(self, event: QMouseEvent) -> None:
         self.snipping: bool = False
         QApplication.restoreOverrideCursor()
@@ -120,8 +166,17 @@ class ScreenHandler(QWidget):
         
         self.repaint()
         QApplication.processEvents()
-        image: QImage = self._image.copy(x[0], y[0], x[1] - x[0], y[1] - y[0])
         
-        self._image_callback(image)
+        region: QRect = QRect(int(x[0]), int(y[0]), int(x[1] - x[0]), int(y[1] - y[0]))
+        # the selection is cut out of the pixmap first, so only those pixels are converted
+        with span("screenshot.crop", width=region.width(), height=region.height()):
+            image: QImage = self._pixmap.copy(self.source_rect(QRectF(region)).toAlignedRect()).toImage()
         
+        # the overlays and the grabs of every screen are dropped before the selection is handed on,
+        # so they are not held at the same time as whatever the callbacks allocate
         self._release()
+        checkpoint("screenshot.released")
+        
+        self._region_callback(self.screen(), region)
+        with span("screenshot.deliver"):
+            self._image_callback(image)
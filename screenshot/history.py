@@ -0,0 +1,191 @@
+import hashlib
+import itertools
+import os
+import shutil
+import threading
+import time
+import zlib
+from typing import Dict, List, Tuple
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+import numpy as np
+
+from utils.cache import LRUCache
+from utils.imaging import CHANNELS, qimage_to_array
+
+class Capture():
+    def __init__(self, capture_id: int, width: int, height: int, image_format: QImage.Format, tile_size: int, tiles: List[str], thumbnail: QImage) -> None:
+        self.id: int = capture_id
+        self.timestamp: float = time.time()
+        self.width: int = width
+        self.height: int = height
+        self.format: QImage.Format = image_format
+        self.tile_size: int = tile_size
+        # tile keys in row major order
+        self.tiles: List[str] = tiles
+        self.thumbnail: QImage = thumbnail
+        
+    @property
+    def channels(self) -> int:
+        return CHANNELS[self.format]
+        
+    @property
+    def nbytes(self) -> int:
+        return self.width * self.height * self.channels
+
+class CaptureHistory():
+    # captures are split into tiles which are stored once per distinct content,
+    # so consecutive shots of a mostly unchanged desktop share almost all of their memory.
+    # Tiles beyond the memory budget are spilled zlib compressed to `directory`.
+    def __init__(self, directory: str, max_bytes: int = 64 * 2 ** 20, max_disk_bytes: int = 2 * 2 ** 30, tile_size: int = 256, thumbnail_size: int = 160) -> None:
+        self.directory: str = directory
+        self.max_disk_bytes: int = max_disk_bytes
+        self.tile_size: int = tile_size
+        self.thumbnail_size: int = thumbnail_size
+        
+        self.captures: Dict[int, Capture] = {}
+        self._ids = itertools.count(1)
+        self._refs: Dict[str, int] = {}
+        self._spilled: Dict[str, int] = {}
+        self.disk_bytes: int = 0
+        
+        self.memory: LRUCache = LRUCache(max_bytes, on_evict=self.spill)
+        # guards the reference counts and the spill area, the tile cache has its own lock
+        self._lock: threading.RLock = threading.RLock()
+        
+        # the spill area only lives as long as the session
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        
+    def __len__(self) -> int:
+        return len(self.captures)
+        
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".tile")
+        
+    def tiles(self, array: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+        height, width = array.shape[:2]
+        size: int = self.tile_size
+        tiles: List[Tuple[str, np.ndarray]] = []
+        
+        for y in range(0, height, size):
+            for x in range(0, width, size):
+                tile: np.ndarray = np.ascontiguousarray(array[y:y + size, x:x + size])
+                # the shape is part of the key, edge tiles with equal bytes can differ in size
+                digest = hashlib.blake2b(tile.data, digest_size=16)
+                digest.update(repr(tile.shape).encode())
+                tiles.append((digest.hexdigest(), tile))
+                
+        return tiles
+        
+    def add(self, image: QImage) -> Capture:
+        if image.format() not in CHANNELS:
+            image = image.convertToFormat(QImage.Format.Format_RGB32)
+            
+        thumbnail: QImage = image.scaled(self.thumbnail_size, self.thumbnail_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        tiles: List[Tuple[str, np.ndarray]] = self.tiles(qimage_to_array(image))
+        
+        with self._lock:
+            for key, tile in tiles:
+                refs: int = self._refs.get(key, 0)
+                self._refs[key] = refs + 1
+                
+                if refs == 0:
+                    self.memory.put(key, tile.tobytes())
+                    
+            capture: Capture = Capture(next(self._ids), image.width(), image.height(), image.format(), self.tile_size, [key for key, _ in tiles], thumbnail)
+            self.captures[capture.id] = capture
+            
+            # the oldest captures are dropped once the spill area is full
+            while self.disk_bytes > self.max_disk_bytes and len(self.captures) > 1:
+                self.remove(next(iter(self.captures)))
+                
+        return capture
+        
+    def remove(self, capture_id: int) -> None:
+        with self._lock:
+            capture: Capture = self.captures.pop(capture_id, None)
+            if capture is None:
+                return
+                
+            for key in capture.tiles:
+                self._refs[key] -= 1
+                if self._refs[key] > 0:
+                    continue
+                    
+                del self._refs[key]
+                self.memory.pop(key)
+                
+                size: int = self._spilled.pop(key, None)
+                if size is not None:
+                    self.disk_bytes -= size
+                    try:
+                        os.remove(self.path(key))
+                    except OSError:
+                        pass
+                        
+    def clear(self) -> None:
+        with self._lock:
+            for capture_id in list(self.captures):
+                self.remove(capture_id)
+                
+    def close(self) -> None:
+        self.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        
+    def spill(self, key: str, data: bytes) -> None:
+        with self._lock:
+            # tiles of removed captures and tiles already on disk are simply dropped
+            if key in self._spilled or key not in self._refs:
+                return
+                
+            path: str = self.path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # level 1 is several times faster than the default and screen content still compresses well
+            compressed: bytes = zlib.compress(data, 1)
+            with open(path, "wb") as f:
+                f.write(compressed)
+                
+            self._spilled[key] = len(compressed)
+            self.disk_bytes += len(compressed)
+            
+    def tile(self, key: str) -> bytes:
+        with self._lock:
+            data: bytes = self.memory.get(key)
+            if data is not None:
+                return data
+                
+            with open(self.path(key), "rb") as f:
+                data = zlib.decompress(f.read())
+                
+            # recently viewed tiles move back into memory
+            self.memory.put(key, data)
+            return data
+            
+    def image(self, capture_id: int) -> QImage:
+        capture: Capture = self.captures[capture_id]
+        size: int = capture.tile_size
+        channels: int = capture.channels
+        
+        shape: Tuple[int, ...] = (capture.height, capture.width) if channels == 1 else (capture.height, capture.width, channels)
+        array: np.ndarray = np.empty(shape, dtype=np.uint8)
+        
+        keys = iter(capture.tiles)
+        for y in range(0, capture.height, size):
+            for x in range(0, capture.width, size):
+                region: np.ndarray = array[y:y + size, x:x + size]
+                region[...] = np.frombuffer(self.tile(next(keys)), dtype=np.uint8).reshape(region.shape)
+                
+        # QImage keeps a reference to the array, the pixels are not copied again
+        return QImage(array.data, capture.width, capture.height, array.strides[0], capture.format)
+        
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "captures": len(self.captures),
+                "tiles": len(self._refs),
+                "raw_bytes": sum(capture.nbytes for capture in self.captures.values()),
+                "memory_bytes": self.memory.size,
+                "disk_bytes": self.disk_bytes,
+            }
@@ -1,16 +1,26 @@
-from typing import Callable, List
+from typing import TYPE_CHECKING, Callable, List
 
-from PySide6.QtCore import Qt, QStandardPaths, QDir, QRect
-from PySide6.QtWidgets import QWidget, QApplication, QLabel, QSizePolicy, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QDialog, QMessageBox, QComboBox
-from PySide6.QtGui import QPixmap, QImageWriter, QScreen, QImage, QDesktopServices
-from PIL.ImageQt import ImageQt
-from PIL.Image import Image
+import os
+import time
+
+from PySide6.QtCore import Qt, QStandardPaths, QDir, QRect, QSize, QTimer
+from PySide6.QtWidgets import QWidget, QApplication, QLabel, QSizePolicy, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QDialog, QMessageBox, QComboBox, QListWidget, QListWidgetItem, QListView
+from PySide6.QtGui import QPixmap, QImageWriter, QScreen, QImage, QDesktopServices, QIcon
 
 from screenshot.tool import ScreenshotTool
-from utils import save_image
+from utils.memory import SpillableImage, checkpoint
+from utils.preview import PreviewLabel
+from utils.trace import traced
+from utils.worker import TaskRunner
+
+if TYPE_CHECKING:
+    from screenshot.history import Capture, CaptureHistory
 
 class ScreenshotMenu(QWidget):    
-    def __init__(self, main_window: QWidget = None) -> None:
+    # ms after the last use of a capture before its pixels are moved out of memory
+    SPILL_AFTER: int = 10_000
+    
+    def __init__(self, main_window: QWidget = None, screenshot_tool: ScreenshotTool = None) -> None:
         super(ScreenshotMenu, self).__init__()
         
         self.main_window: QWidget = main_window
@@ -31,16 +41,37 @@ class ScreenshotMenu(QWidget):
         cb_layout: QHBoxLayout = QHBoxLayout()
         cb_layout.addWidget(self.cb)
         
-        self.screenshot: QLabel = QLabel(self)
+        self.screenshot: PreviewLabel = PreviewLabel(self)
         self.screenshot.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.screenshot.setAlignment(Qt.AlignCenter)
-        self.image: QImage = None
+        
+        # the full resolution capture is only needed to save it, the label shows a scaled copy
+        self._image: SpillableImage = None
+        self.spill_timer: QTimer = QTimer(self)
+        self.spill_timer.setSingleShot(True)
+        self.spill_timer.setInterval(self.SPILL_AFTER)
+        self.spill_timer.timeout.connect(self.spill_image)
         
         self.geometry: QRect = self.screen().geometry()
         self.screenshot.setMinimumSize(self.geometry.width() / 8, self.geometry.height() / 8)
         
+        # earlier captures, created with the first one so numpy is not loaded at startup
+        self._history: "CaptureHistory" = None
+        self.history_runner: TaskRunner = TaskRunner(max_workers=1, latest_only=False, parent=self)
+        self.history_runner.finished.connect(self.capture_stored)
+        
+        self.history_list: QListWidget = QListWidget(self)
+        self.history_list.setViewMode(QListView.ViewMode.IconMode)
+        self.history_list.setFlow(QListView.Flow.LeftToRight)
+        self.history_list.setWrapping(False)
+        self.history_list.setIconSize(QSize(96, 54))
+        self.history_list.setFixedHeight(90)
+        self.history_list.itemClicked.connect(self.show_capture)
+        self.history_list.hide()
+        
         main_layout.addLayout(cb_layout)
         main_layout.addWidget(self.screenshot)
+        main_layout.addWidget(self.history_list)
         
         buttons: QHBoxLayout = QHBoxLayout()
         self.new: QPushButton = QPushButton("New", self)
@@ -58,15 +89,51 @@ class ScreenshotMenu(QWidget):
         
         main_layout.addLayout(buttons)
         
-        self.screenshot_tool: ScreenshotTool = ScreenshotTool(outer=self.main_window, image_callback=self.update_screenshot)
+        self.screenshot_tool: ScreenshotTool = screenshot_tool or ScreenshotTool(outer=self.main_window)
+        
+    @property
+    def image(self) -> QImage:
+        if self._image is None:
+            return None
+            
+        # every use postpones the spill
+        self.spill_timer.start()
+        return self._image.get()
+        
+    @image.setter
+    def image(self, image: QImage) -> None:
+        if self._image is not None:
+            self._image.close()
+            
+        self._image = SpillableImage(image) if image is not None else None
+        self.spill_timer.start()
+        
+    def spill_image(self) -> None:
+        if self._image is None:
+            return
+            
+        self._image.spill()
+        checkpoint("screenshot.spilled")
+        
+    @property
+    def history(self) -> "CaptureHistory":
+        # stored deduplicated and decoded again only when selected
+        if self._history is None:
+            from screenshot.history import CaptureHistory
+            self._history = CaptureHistory(
+                os.path.join(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation), "history", str(os.getpid()))
+            )
+            QApplication.instance().aboutToQuit.connect(self._history.close)
+            
+        return self._history
         
     def all_screens_screenshot(self) -> None:
-        image: Image = self.screenshot_tool.take_full_screenshot()
+        image: QImage = self.screenshot_tool.take_full_screenshot()
         self.update_screenshot(image)
     
     def specific_screen_screenshot(self) -> None:
         screen: QScreen = self.cb.currentData().get('screen')
-        image: Image = self.screenshot_tool.take_full_screenshot(screen)
+        image: QImage = self.screenshot_tool.take_full_screenshot(screen)
         self.update_screenshot(image)
         
     # def new_screenshot(self):
@@ -78,7 +145,7 @@ class ScreenshotMenu(QWidget):
         _exec()
     
     def area_screenshot(self) -> None:
-        self.screenshot_tool.take_area_screenshot()
+        self.screenshot_tool.take_area_screenshot(self.update_screenshot)
         
     def save_screenshot(self) -> None:
         msgs = {
@@ -91,7 +158,10 @@ class ScreenshotMenu(QWidget):
             "open_button_text": "Open Image"
         }
         
-        save_image(self, self.image)
+        from utils import save_image
+        
+        # screenshots are large and archived in bulk, encoding speed matters more than a few percent of size
+        save_image(self, self.image, msgs, preset="fast")
     
     # def save_screenshot(self) -> None:
     #     if not self.image:
@@ -147,17 +217,34 @@ class ScreenshotMenu(QWidget):
     #     button2.clicked.connect(lambda: QDesktopServices.openUrl(initial_path))
     #     message_box.exec_()
 
-    def update_screenshot(self, img: Image | QImage) -> None:
-        if not isinstance(img, QImage):
-            img: QImage = ImageQt(img)
-        
-        self.image: QImage = img
-        
-        pixmap: QPixmap = QPixmap.fromImage(self.image)
-        self.screenshot.setPixmap(
-            pixmap.scaled(
-                self.screenshot.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-        )
+    def update_screenshot(self, img: QImage) -> None:
+        self.image = img
+        self.show_image(img)
+        
+        # tiling and hashing a multi monitor capture takes a while, it is done off the GUI thread
+        self.history_runner.submit(self.history.add, img)
+        checkpoint("screenshot.shown")
+        
+    def capture_stored(self, generation: int, capture: "Capture") -> None:
+        item: QListWidgetItem = QListWidgetItem(QIcon(QPixmap.fromImage(capture.thumbnail)), time.strftime("%H:%M:%S", time.localtime(capture.timestamp)))
+        item.setData(Qt.ItemDataRole.UserRole, capture.id)
+        item.setToolTip(f"{capture.width}x{capture.height}")
+        
+        self.history_list.insertItem(0, item)
+        self.history_list.setCurrentItem(item)
+        self.history_list.show()
+        
+    def show_capture(self, item: QListWidgetItem) -> None:
+        capture_id: int = item.data(Qt.ItemDataRole.UserRole)
+        if capture_id not in self.history.captures:
+            self.history_list.takeItem(self.history_list.row(item))
+            return
+            
+        image: QImage = self.history.image(capture_id)
+        self.image = image
+        self.show_image(image)
+        
+    @traced("preview.show_image")
+    def show_image(self, image: QImage) -> None:
+        # served from a pyramid built off the GUI thread, which also follows resizes
+        self.screenshot.set_image(image)
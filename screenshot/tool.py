@@ -1,53 +1,169 @@
+import sys
 import time
-from typing import Callable, List
+import logging
+from typing import TYPE_CHECKING, Callable, List
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, QEvent, QEventLoop, QRect, QTimer
 from PySide6.QtWidgets import QWidget, QApplication
-from PySide6.QtGui import QCursor, QPixmap, QScreen
-from PIL import ImageGrab
-from PIL.ImageQt import fromqpixmap
-from PIL.Image import Image
+from PySide6.QtGui import QCursor, QPixmap, QScreen, QWindow, QImage
 
 from screenshot.handler import ScreenHandler
 from utils import no_callback
+from utils.trace import span, traced
+
+if TYPE_CHECKING:
+    from screenshot.backends import CaptureBackend
+
+logger = logging.getLogger(__name__)
+
+class HiddenWatcher(QObject):
+    def __init__(self, window: QWindow, loop: QEventLoop) -> None:
+        super(HiddenWatcher, self).__init__()
+        
+        self.window: QWindow = window
+        self.loop: QEventLoop = loop
+        
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        # the platform sends an expose event once the window manager has unmapped the window
+        if event.type() == QEvent.Type.Expose and not self.window.isExposed():
+            self.loop.quit()
+            
+        return False
+
+def disable_transitions(widget: QWidget) -> None:
+    if sys.platform != "win32":
+        return
+        
+    # dwm fades windows out after they are hidden, which would end up in the capture
+    import ctypes
+    DWMWA_TRANSITIONS_FORCEDISABLED = 3
+    value = ctypes.c_int(1)
+    try:
+        ctypes.windll.dwmapi.DwmSetWindowAttribute(int(widget.winId()), DWMWA_TRANSITIONS_FORCEDISABLED, ctypes.byref(value), ctypes.sizeof(value))
+    except (AttributeError, OSError):
+        pass
 
 class ScreenshotTool():
-    def __init__(self, outer: QWidget = None, image_callback: Callable = no_callback) -> None:
+    # a single instance is shared by every tab, the callbacks are chosen per area screenshot
+    def __init__(self, outer: QWidget = None, image_callback: Callable = no_callback, region_callback: Callable = no_callback, hide_timeout: int = 300, backend: "CaptureBackend" = None) -> None:
         self.outer: QWidget = outer
+        self._backend: "CaptureBackend" = backend
+        # upper bound in ms for waiting on the window manager to hide the window
+        self.hide_timeout: int = hide_timeout
+        self.hide_latency: float = 0.0
+        self._hidden_at: float = 0.0
         
-        self.screens: List[ScreenHandler] = []
-        for screen in QApplication.screens()[:]:            
-            screen_handler: ScreenHandler = ScreenHandler(screen = screen, image_callback=image_callback, release_event=self.release_screens)
+        self.image_callback: Callable = image_callback
+        self.region_callback: Callable = region_callback
+        self._image_callback: Callable = image_callback
+        self._region_callback: Callable = region_callback
+        
+        if self.outer is not None:
+            disable_transitions(self.outer)
+            
+        self._screens: List[ScreenHandler] = None
+        
+    @property
+    def backend(self) -> "CaptureBackend":
+        # numpy and the platform libraries are only loaded with the first capture
+        if self._backend is None:
+            from screenshot.backends import select_backend
+            self._backend = select_backend()
+            logger.info("capture backend: %s", self._backend.name)
             
-            self.screens.append(screen_handler)
+        return self._backend
+        
+    @property
+    def screens(self) -> List[ScreenHandler]:
+        # the overlays are created on the first area screenshot, not at startup
+        if self._screens is None:
+            self._screens = [
+                ScreenHandler(screen=screen, image_callback=self.deliver_image, release_event=self.release_screens, region_callback=self.deliver_region)
+                for screen in QApplication.screens()
+            ]
+            
+        return self._screens
+        
+    def deliver_image(self, image: QImage) -> None:
+        self._image_callback(image)
+        
+    def deliver_region(self, screen: QScreen, region: QRect) -> None:
+        self._region_callback(screen, region)
         
     def release_screens(self) -> None:
         for screen in self.screens:
             screen.close()
+            # the grabs of every screen are dropped with the overlays
+            screen.clear_screenshot()
             
-        self.outer.show()
+        if self.outer is not None:
+            self.outer.show()
+            
+    @traced("screenshot.hide")
+    def hide_outer(self) -> None:
+        self._hidden_at = time.perf_counter()
         
-    def take_full_screenshot(self, screen: QScreen = None) -> Image:
+        if self.outer is None:
+            return
+            
         self.outer.hide()
-        time.sleep(0.3)        
-        # image = ImageGrab.grab(bbox=(0, 0, 1920, 1080))
-        image: Image = ImageGrab.grab(bbox=None, all_screens=True) if not screen else fromqpixmap(screen.grabWindow())
-        self.outer.show()
+        
+        window: QWindow = self.outer.windowHandle()
+        if window is None or not window.isExposed():
+            return
             
-        return image
+        loop: QEventLoop = QEventLoop()
+        watcher: HiddenWatcher = HiddenWatcher(window, loop)
+        window.installEventFilter(watcher)
         
-    def take_area_screenshot(self) -> None:        
-        QApplication.setOverrideCursor(QCursor(Qt.CursorShape.CrossCursor))
+        timer: QTimer = QTimer()
+        timer.setSingleShot(True)
+        timer.timeout.connect(loop.quit)
+        timer.start(self.hide_timeout)
         
-        self.outer.hide()
-        time.sleep(0.3)
-        for screen in self.screens:
-            screenshot: QPixmap = screen.screen().grabWindow()
+        if window.isExposed():
+            loop.exec()
             
-            screen._pixmap = screenshot
-            screen._image = screenshot.toImage()
+        timer.stop()
+        window.removeEventFilter(watcher)
+        
+        if window.isExposed():
+            logger.warning("window still exposed after %d ms, capturing anyway", self.hide_timeout)
             
-            screen.snipping = True
+    def capture_started(self) -> None:
+        self.hide_latency = time.perf_counter() - self._hidden_at
+        logger.info("hide to capture latency: %.1f ms", self.hide_latency * 1000)
+        
+    @traced("screenshot.full")
+    def take_full_screenshot(self, screen: QScreen = None) -> QImage:
+        self.hide_outer()
+        self.capture_started()
+        with span("screenshot.grab", backend=self.backend.name):
+            image: QImage = self.backend.grab([screen] if screen else QApplication.screens())
+        if self.outer is not None:
+            self.outer.show()
             
-            screen.showFullScreen()
+        return image
+        
+    @traced("screenshot.area")
+    def take_area_screenshot(self, image_callback: Callable = None, region_callback: Callable = None) -> None:
+        self._image_callback = image_callback or self.image_callback
+        self._region_callback = region_callback or (no_callback if image_callback else self.region_callback)
+        
+        QApplication.setOverrideCursor(QCursor(Qt.CursorShape.CrossCursor))
+        
+        self.hide_outer()
+        self.capture_started()
+        # QScreen grabs only work on the GUI thread, they are issued back to back
+        # before any overlay is shown so all screens are captured at the same moment
+        with span("screenshot.grab", backend="qt", screens=len(self.screens)):
+            screenshots: List[QPixmap] = [screen.screen().grabWindow() for screen in self.screens]
+        
+        with span("screenshot.overlay"):
+            for screen, screenshot in zip(self.screens, screenshots):
+                screen.set_screenshot(screenshot)
+                
+                screen.snipping = True
+                
+                screen.showFullScreen()
         
@@ -1,5 +1,30 @@
+from importlib import import_module
+
 from .callbacks import no_callback
-from .image import save_image
-from .generator import QRCodeGenerator
 
-GENERATORS = {generator.__name__.removesuffix('Generator').lower(): generator for generator in QRCodeGenerator.__subclasses__()}
\ No newline at end of file
+# heavy modules (Qt, cv2, segno) are only imported on first access, so that
+# headless entry points like `python -m qrcode.batch` never load the GUI stack
+_LAZY = {
+    "save_image": ".image",
+    "QRCodeGenerator": ".generator",
+    "QRCodeDecoder": ".decoder",
+    "OpenCVDecoder": ".decoder",
+    "ArucoDecoder": ".decoder",
+    "CascadeDecoder": ".decoder",
+    "CachedDecoder": ".decoder",
+}
+
+def __getattr__(name: str):
+    if name == "GENERATORS":
+        from .generator import QRCodeGenerator
+        value = {generator.__name__.removesuffix('Generator').lower(): generator for generator in QRCodeGenerator.__subclasses__()}
+    elif name == "DECODERS":
+        from .decoder import QRCodeDecoder
+        value = {decoder.__name__.removesuffix('Decoder').lower(): decoder for decoder in QRCodeDecoder.__subclasses__()}
+    elif name in _LAZY:
+        value = getattr(import_module(_LAZY[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        
+    globals()[name] = value
+    return value
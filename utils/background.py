@@ -0,0 +1,73 @@
+import io
+from typing import Iterator, Tuple
+
+from PIL import Image, ImageSequence
+
+from .cache import LRUCache, file_identity
+
+class Background():
+    def __init__(self, path: str, size: int = 800) -> None:
+        self.path: str = path
+        self.size: int = size
+        
+        with Image.open(path) as image:
+            self.n_frames: int = getattr(image, "n_frames", 1)
+            self.is_animated: bool = getattr(image, "is_animated", False)
+            self.loop: int = image.info.get("loop", 0)
+            self.first: Image.Image = self.prepare(image)
+            
+        self.data: bytes = self.to_stream(self.first).getvalue()
+        
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.first.width * self.first.height * 4
+        
+    def prepare(self, frame: Image.Image) -> Image.Image:
+        # jpeg can decode at 1/2, 1/4 or 1/8 of the size right away
+        frame.draft("RGB", (self.size, self.size))
+        
+        if frame.mode not in ("RGB", "RGBA", "L"):
+            frame = frame.convert("RGBA")
+        else:
+            frame = frame.copy()
+            
+        frame.thumbnail((self.size, self.size), Image.Resampling.LANCZOS)
+        
+        return frame
+        
+    @staticmethod
+    def to_stream(frame: Image.Image) -> io.BytesIO:
+        # the artistic writer only accepts files, an uncompressed tiff of the
+        # downscaled frame decodes in about a millisecond
+        out: io.BytesIO = io.BytesIO()
+        frame.save(out, format="TIFF")
+        out.seek(0)
+        
+        return out
+        
+    def stream(self) -> io.BytesIO:
+        return io.BytesIO(self.data)
+        
+    def frames(self) -> Iterator[Tuple[Image.Image, int]]:
+        # animated backgrounds are decoded frame by frame while iterating,
+        # only the current frame is held in memory
+        if not self.is_animated:
+            yield self.first, 0
+            return
+            
+        with Image.open(self.path) as image:
+            for frame in ImageSequence.Iterator(image):
+                yield self.prepare(frame), frame.info.get("duration", 0)
+
+# decoded backgrounds keyed by file identity and target size
+backgrounds: LRUCache = LRUCache(max_bytes=128 * 2 ** 20, sizeof=lambda background: background.nbytes)
+
+def load_background(path: str, size: int = 800) -> Background:
+    key = (file_identity(path), size)
+    
+    background: Background = backgrounds.get(key)
+    if background is None:
+        background = Background(path, size)
+        backgrounds.put(key, background)
+        
+    return background
@@ -0,0 +1,245 @@
+import os
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+def content_key(*parts: Any) -> str:
+    data: bytes = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False).encode("utf8")
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def file_identity(path: str) -> Tuple[str, int, int] | None:
+    # cheaper than hashing the file and good enough to notice edits
+    if not path:
+        return None
+        
+    try:
+        stat: os.stat_result = os.stat(path)
+    except OSError:
+        return None
+        
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+class LRUCache():
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = len, on_evict: Callable[[Hashable, Any], None] = None) -> None:
+        self.max_bytes: int = max_bytes
+        self.sizeof: Callable[[Any], int] = sizeof
+        # called with every entry pushed out by the budget, outside of the lock
+        self.on_evict: Callable[[Hashable, Any], None] = on_evict
+        self.size: int = 0
+        
+        self._items: OrderedDict[Hashable, Tuple[Any, int]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        
+    def __len__(self) -> int:
+        return len(self._items)
+        
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+        
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+                
+            self._items.move_to_end(key)
+            self.hits += 1
+            
+            return item[0]
+            
+    def put(self, key: Hashable, value: Any) -> None:
+        size: int = self.sizeof(value)
+        if size > self.max_bytes:
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            return
+            
+        evicted: List[Tuple[Hashable, Any]] = []
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+                
+            self._items[key] = (value, size)
+            self.size += size
+            
+            while self.size > self.max_bytes:
+                evicted_key, (evicted_value, evicted_size) = self._items.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+                evicted.append((evicted_key, evicted_value))
+                
+        if self.on_evict is not None:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+                
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return default
+                
+            self.size -= item[1]
+            return item[0]
+            
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+            
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._items),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class DiskCache():
+    def __init__(self, directory: str, max_bytes: int = 512 * 2 ** 20, suffix: str = ".bin") -> None:
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.suffix: str = suffix
+        
+        self.hits: int = 0
+        self.misses: int = 0
+        
+        os.makedirs(self.directory, exist_ok=True)
+        # kept up to date on writes, the directory is only walked again when trimming
+        self.size: int = sum(entry[1] for entry in self.entries())
+        
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+        
+    def get(self, key: str) -> bytes | None:
+        path: str = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data: bytes = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+            
+        # the modification time doubles as last access for the eviction order
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+            
+        self.hits += 1
+        return data
+        
+    def put(self, key: str, data: bytes) -> None:
+        path: str = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # written under a temporary name first, so readers never see partial files
+        tmp: str = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+            
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.trim()
+            
+    def entries(self) -> List[Tuple[float, int, str]]:
+        entries: List[Tuple[float, int, str]] = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                try:
+                    stat: os.stat_result = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+                
+        return entries
+        
+    def trim(self) -> None:
+        entries: List[Tuple[float, int, str]] = self.entries()
+        self.size = sum(entry[1] for entry in entries)
+        
+        # oldest first, down to 90% of the budget so not every write trims again
+        for _, file_size, path in sorted(entries):
+            if self.size <= self.max_bytes * 0.9:
+                break
+                
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+                
+            self.size -= file_size
+            
+    def stats(self) -> Dict[str, int]:
+        return {
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+class TieredCache():
+    def __init__(self, memory: LRUCache, disk: DiskCache = None, encode: Callable[[Any], bytes] = None, decode: Callable[[bytes], Any] = None) -> None:
+        self.memory: LRUCache = memory
+        self.disk: DiskCache = disk
+        # conversion between the in memory value and the bytes stored on disk
+        self.encode: Callable[[Any], bytes] = encode or (lambda value: value)
+        self.decode: Callable[[bytes], Any] = decode or (lambda data: data)
+        
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+            
+        data: bytes = self.disk.get(key)
+        if data is None:
+            return None
+            
+        value = self.decode(data)
+        if value is not None:
+            self.memory.put(key, value)
+            
+        return value
+        
+    def put(self, key: str, value: Any) -> None:
+        self.memory.put(key, value)
+        
+        if self.disk is not None:
+            self.disk.put(key, self.encode(value))
+            
+    def get_or_create(self, key: str, create: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.put(key, value)
+            
+        return value
+        
+    def clear(self) -> None:
+        self.memory.clear()
+        
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        stats: Dict[str, Dict[str, int]] = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+            
+        return stats
@@ -1,2 +1,2 @@
-def no_callback(**kwargs):
+def no_callback(*args, **kwargs):
     pass
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import time
+from abc import ABC
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from .cache import DiskCache, LRUCache, TieredCache
+from .trace import span
+
+Box = List[Tuple[float, float]]
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+        
+    # the weights of RGB and BGR differ slightly, which does not matter for black and white codes
+    code: int = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(image, code)
+
+def read_multi(detector: cv2.QRCodeDetector, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+    retval, info, bboxes, _ = detector.detectAndDecodeMulti(image)
+    
+    if not retval or bboxes is None:
+        return [], []
+        
+    boxes: List[Box] = [[(float(x), float(y)) for x, y in bbox] for bbox in bboxes]
+    
+    return list(info), boxes
+
+def read_single(detector: cv2.QRCodeDetector, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+    text, points, _ = detector.detectAndDecode(image)
+    
+    if not text or points is None:
+        return [], []
+        
+    return [text], [[(float(x), float(y)) for x, y in points.reshape(-1, 2)]]
+
+class QRCodeDecoder(ABC):
+    def decode(self, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+        pass
+
+class OpenCVDecoder(QRCodeDecoder):
+    def __init__(self) -> None:
+        # building a detector is not free, so one instance is kept per decoder
+        self.detector: cv2.QRCodeDetector = cv2.QRCodeDetector()
+
+    def decode(self, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+        return read_multi(self.detector, image)
+
+class ArucoDecoder(QRCodeDecoder):
+    def __init__(self) -> None:
+        # locates finder patterns with the aruco machinery, slower but more tolerant
+        self.detector: cv2.QRCodeDetectorAruco = cv2.QRCodeDetectorAruco()
+
+    def decode(self, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+        return read_multi(self.detector, image)
+
+class CascadeDecoder(QRCodeDecoder):
+    # cheapest first, the first stage that reads a code ends the cascade
+    STAGES: Tuple[str, ...] = ("gray", "aruco", "single", "threshold", "inverted", "upscaled", "rotated")
+
+    def __init__(self, stages: List[str] = None, upscale_below: int = 400, angle: float = 45.0) -> None:
+        unknown: List[str] = [stage for stage in stages or [] if stage not in self.STAGES]
+        if unknown:
+            raise ValueError(f"unknown stages: {', '.join(unknown)}")
+            
+        self.stages: List[str] = list(stages or self.STAGES)
+        # crops whose shorter side is below this are scaled up, codes in them are probably tiny
+        self.upscale_below: int = upscale_below
+        self.angle: float = angle
+        
+        self.detector: cv2.QRCodeDetector = cv2.QRCodeDetector()
+        self._aruco: cv2.QRCodeDetectorAruco = None
+        
+        # stage that read the last image, None if none did
+        self.stage: str | None = None
+        self.stats: Dict[str, Dict] = {stage: {"runs": 0, "hits": 0, "seconds": 0.0} for stage in self.stages}
+        
+    @property
+    def aruco(self) -> cv2.QRCodeDetectorAruco:
+        if self._aruco is None:
+            self._aruco = cv2.QRCodeDetectorAruco()
+            
+        return self._aruco
+        
+    def read(self, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+        # the multi detector misses some single codes that detectAndDecode reads
+        texts, boxes = read_multi(self.detector, image)
+        if any(texts):
+            return texts, boxes
+            
+        return read_single(self.detector, image)
+        
+    def stage_gray(self, gray: np.ndarray) -> Tuple[List[str], List[Box]]:
+        return read_multi(self.detector, gray)
+        
+    def stage_single(self, gray: np.ndarray) -> Tuple[List[str], List[Box]]:
+        return read_single(self.detector, gray)
+        
+    def stage_threshold(self, gray: np.ndarray) -> Tuple[List[str], List[Box]]:
+        # evens out low contrast and uneven lighting, the block spans a few modules of a small code
+        binary: np.ndarray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 5)
+        return self.read(binary)
+        
+    def stage_inverted(self, gray: np.ndarray) -> Tuple[List[str], List[Box]]:
+        # light modules on a dark background, as on dark themes
+        return self.read(cv2.bitwise_not(gray))
+        
+    def stage_upscaled(self, gray: np.ndarray) -> Tuple[List[str], List[Box]] | None:
+        shorter: int = min(gray.shape[:2])
+        if shorter >= self.upscale_below:
+            return None
+            
+        # whole pixel factors with nearest neighbour keep the module edges sharp
+        factor: int = min(max(-(-self.upscale_below // max(shorter, 1)), 2), 8)
+        texts, boxes = self.read(cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_NEAREST))
+        
+        return texts, [[(x / factor, y / factor) for x, y in box] for box in boxes]
+        
+    def stage_rotated(self, gray: np.ndarray) -> Tuple[List[str], List[Box]]:
+        height, width = gray.shape[:2]
+        matrix: np.ndarray = cv2.getRotationMatrix2D((width / 2, height / 2), self.angle, 1.0)
+        
+        # the canvas grows so the corners of the image are not cut off
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        size: Tuple[int, int] = (int(height * sin + width * cos) + 1, int(height * cos + width * sin) + 1)
+        matrix[0, 2] += size[0] / 2 - width / 2
+        matrix[1, 2] += size[1] / 2 - height / 2
+        
+        border: int = int(np.median(gray[[0, -1]]))
+        texts, boxes = self.read(cv2.warpAffine(gray, matrix, size, borderValue=border))
+        
+        # boxes are mapped back into the coordinates of the input
+        inverse: np.ndarray = cv2.invertAffineTransform(matrix)
+        return texts, [[tuple(float(v) for v in inverse @ (x, y, 1.0)) for x, y in box] for box in boxes]
+        
+    def stage_aruco(self, gray: np.ndarray) -> Tuple[List[str], List[Box]]:
+        return read_multi(self.aruco, gray)
+        
+    def decode(self, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+        gray: np.ndarray = to_gray(image)
+        self.stage = None
+        
+        for stage in self.stages:
+            method: Callable = getattr(self, f"stage_{stage}")
+            
+            start: float = time.perf_counter()
+            with span(f"decoder.{stage}"):
+                result: Tuple[List[str], List[Box]] | None = method(gray)
+            elapsed: float = time.perf_counter() - start
+            
+            # stages that do not apply to the image are not counted
+            if result is None:
+                continue
+                
+            stats: Dict = self.stats[stage]
+            stats["runs"] += 1
+            stats["seconds"] += elapsed
+            
+            texts, boxes = result
+            if any(texts):
+                stats["hits"] += 1
+                self.stage = stage
+                return texts, boxes
+                
+        return [], []
+
+class Fingerprint():
+    # the image is cut to the dark pixels first, so crops of the same code with more or less
+    # margin hash the same and boxes are kept relative to the cut
+    def __init__(self, gray: np.ndarray, salt: str = "") -> None:
+        self.origin, self.size = self.bounds(gray)
+        x, y = self.origin
+        width, height = self.size
+        cut: np.ndarray = gray[y:y + height, x:x + width]
+        
+        hasher = hashlib.blake2b(f"{salt}:cut:{cut.shape}".encode("utf8"), digest_size=16)
+        hasher.update(np.ascontiguousarray(cut))
+        self.key: str = hasher.hexdigest()
+        
+    @staticmethod
+    def bounds(gray: np.ndarray) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        height, width = gray.shape[:2]
+        
+        # rows and columns with at least two dark pixels, a single one is more likely noise
+        _, dark = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        rows: np.ndarray = np.flatnonzero(dark.sum(axis=1) >= 2)
+        columns: np.ndarray = np.flatnonzero(dark.sum(axis=0) >= 2)
+        
+        # an empty or uniform image is used as it is
+        if len(rows) == 0 or len(columns) == 0:
+            return (0, 0), (width, height)
+            
+        return (int(columns[0]), int(rows[0])), (int(columns[-1] - columns[0] + 1), int(rows[-1] - rows[0] + 1))
+        
+    def normalize(self, boxes: List[Box]) -> List[List[List[float]]]:
+        # relative to the cut, 0-1 on both axes
+        (x, y), (width, height) = self.origin, self.size
+        return [[[(px - x) / width, (py - y) / height] for px, py in box] for box in boxes]
+        
+    def restore(self, boxes: List[List[List[float]]]) -> List[Box]:
+        (x, y), (width, height) = self.origin, self.size
+        return [[(x + u * width, y + v * height) for u, v in box] for box in boxes]
+
+class DecodeCache():
+    # decode results keyed by the exact content of the grayscale image cut to its dark pixels, with
+    # boxes relative to the cut. Similar looking images are not matched: two dense codes that differ
+    # in a few modules look alike at any size a perceptual hash can afford.
+    def __init__(self, max_bytes: int = 2 * 2 ** 20) -> None:
+        self.results: TieredCache = TieredCache(
+            LRUCache(max_bytes, sizeof=self.sizeof),
+            encode=lambda value: json.dumps(value).encode("utf8"),
+            decode=lambda data: json.loads(data)
+        )
+        
+    @staticmethod
+    def sizeof(value: Dict) -> int:
+        return 256 + sum(len(text) for text in value["texts"]) + 64 * len(value["boxes"])
+        
+    def get(self, fingerprint: Fingerprint) -> Dict | None:
+        return self.results.get(fingerprint.key)
+        
+    def put(self, fingerprint: Fingerprint, texts: List[str], boxes: List[Box]) -> None:
+        # images without a code are stored too, a miss is the most expensive decode
+        self.results.put(fingerprint.key, {"texts": list(texts), "boxes": fingerprint.normalize(boxes)})
+        
+    def clear(self) -> None:
+        self.results.clear()
+        
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return self.results.stats()
+
+# shared by every cached decoder of the process
+cache: DecodeCache = DecodeCache()
+
+def enable_disk_cache(directory: str, max_bytes: int = 64 * 2 ** 20) -> None:
+    cache.results.disk = DiskCache(directory, max_bytes=max_bytes, suffix=".json")
+
+class CachedDecoder(QRCodeDecoder):
+    def __init__(self, decoder: QRCodeDecoder = None, decode_cache: DecodeCache = None) -> None:
+        self.decoder: QRCodeDecoder = decoder or CascadeDecoder()
+        self.cache: DecodeCache = decode_cache or cache
+        # results of differently configured decoders must not answer for each other
+        self.salt: str = ":".join([type(self.decoder).__name__, *getattr(self.decoder, "stages", ())])
+        
+        # "cache" for results that were not decoded again, otherwise the stage of the wrapped decoder
+        self.stage: str | None = None
+        
+    def decode(self, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+        gray: np.ndarray = to_gray(image)
+        
+        with span("decoder.fingerprint"):
+            fingerprint: Fingerprint = Fingerprint(gray, self.salt)
+            value: Dict = self.cache.get(fingerprint)
+            
+        if value is not None:
+            self.stage = "cache"
+            return list(value["texts"]), fingerprint.restore(value["boxes"])
+            
+        texts, boxes = self.decoder.decode(gray)
+        self.stage = getattr(self.decoder, "stage", None)
+        self.cache.put(fingerprint, texts, boxes)
+        
+        return texts, boxes
+
+# the decoder of an isolated worker process, kept (with its cache) for every crop the process reads
+_worker_decoder: CachedDecoder = None
+
+def init_worker() -> None:
+    global _worker_decoder
+    
+    _worker_decoder = CachedDecoder()
+    # the detectors load their models with the first image, so that is not the first crop
+    _worker_decoder.decode(np.full((64, 64), 255, dtype=np.uint8))
+
+def decode_in_worker(image: np.ndarray) -> Tuple[List[str], List[Box], str | None]:
+    if _worker_decoder is None:
+        init_worker()
+        
+    texts, boxes = _worker_decoder.decode(image)
+    return texts, boxes, _worker_decoder.stage
@@ -0,0 +1,142 @@
+import io
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+from PySide6.QtGui import QImage
+from PIL import Image
+
+from .callbacks import no_callback
+from .imaging import qimage_to_pil
+from .trace import span, traced
+
+# formats PIL writes with explicit encoder options, everything else goes through Qt
+PIL_FORMATS: Dict[str, str] = {
+    "png": "PNG",
+    "jpg": "JPEG",
+    "jpeg": "JPEG",
+    "webp": "WEBP",
+    "bmp": "BMP",
+    "tif": "TIFF",
+    "tiff": "TIFF",
+}
+
+# encoder options per format, from fastest to smallest output
+PRESETS: Dict[str, Dict[str, Dict]] = {
+    "PNG": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "small": {"compress_level": 9, "optimize": True},
+    },
+    "JPEG": {
+        "fast": {"quality": 90},
+        "balanced": {"quality": 85, "optimize": True},
+        "small": {"quality": 70, "optimize": True, "progressive": True},
+    },
+    "WEBP": {
+        "fast": {"quality": 80, "method": 0},
+        "balanced": {"quality": 80, "method": 4},
+        "small": {"quality": 75, "method": 6},
+        "lossless": {"lossless": True, "quality": 0, "method": 0},
+    },
+    "TIFF": {
+        "fast": {},
+        "balanced": {"compression": "tiff_lzw"},
+        "small": {"compression": "tiff_adobe_deflate"},
+    },
+}
+
+CHUNK_SIZE: int = 2 ** 20
+
+class EncodeCancelled(Exception):
+    pass
+
+class ProgressFile():
+    # file wrapper handed to the encoder, reports every write and aborts the
+    # encoder from inside the write once cancellation is requested
+    def __init__(self, f: io.BufferedWriter, progress: Callable[[int], None], cancel: threading.Event = None) -> None:
+        self.f: io.BufferedWriter = f
+        self.progress: Callable[[int], None] = progress
+        self.cancel: threading.Event = cancel
+        self.written: int = 0
+        
+    def write(self, data: bytes) -> int:
+        if self.cancel is not None and self.cancel.is_set():
+            raise EncodeCancelled()
+            
+        n: int = self.f.write(data)
+        self.written += len(data)
+        self.progress(self.written)
+        
+        return n
+        
+    def fileno(self) -> int:
+        # PIL writes straight to the descriptor when there is one, which would bypass write()
+        raise io.UnsupportedOperation("fileno")
+        
+    def __getattr__(self, name: str):
+        return getattr(self.f, name)
+
+def image_format(path: str) -> str:
+    return os.path.splitext(path)[1].lstrip(".").lower() or "png"
+
+def presets(suffix: str) -> Dict[str, Dict]:
+    return PRESETS.get(PIL_FORMATS.get(suffix.lower(), ""), {})
+
+def encode_qt(image: QImage, suffix: str, out: ProgressFile) -> None:
+    data: QByteArray = QByteArray()
+    buffer: QBuffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    saved: bool = image.save(buffer, suffix.upper())
+    buffer.close()
+    
+    if not saved:
+        raise ValueError(f"{suffix} is not supported")
+        
+    view: memoryview = memoryview(data.data())
+    for start in range(0, len(view), CHUNK_SIZE):
+        out.write(view[start:start + CHUNK_SIZE])
+
+@traced("save_image.encode")
+def encode_image(image: QImage, path: str, preset: str = "balanced", progress: Callable[[int], None] = no_callback, cancel: threading.Event = None) -> Dict:
+    suffix: str = image_format(path)
+    pil_format: str = PIL_FORMATS.get(suffix)
+    options: Dict = presets(suffix).get(preset, {})
+    
+    start: float = time.perf_counter()
+    
+    # written under a temporary name, a cancelled or failed export never leaves a partial file
+    tmp: str = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            out: ProgressFile = ProgressFile(f, progress, cancel)
+            
+            if pil_format is None:
+                with span("save_image.write", format=suffix.upper(), preset=None):
+                    encode_qt(image, suffix, out)
+            else:
+                with span("save_image.convert"):
+                    pil_image: Image.Image = qimage_to_pil(image)
+                    if pil_format == "JPEG" and pil_image.mode == "RGBA":
+                        pil_image = pil_image.convert("RGB")
+                    
+                with span("save_image.write", format=pil_format, preset=preset):
+                    pil_image.save(out, format=pil_format, **options)
+                
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+        
+    return {
+        "path": path,
+        "format": pil_format or suffix.upper(),
+        "preset": preset if options else None,
+        "bytes": out.written,
+        "encode_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
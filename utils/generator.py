@@ -1,39 +1,145 @@
+import io
 from abc import ABC
 
-from PIL.ImageQt import ImageQt
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+from PySide6.QtGui import QImage
 from PIL import Image
+import numpy as np
 import segno
 
+from .background import Background, load_background
+from .cache import DiskCache, LRUCache, TieredCache, content_key, file_identity
+from .imaging import pil_to_qimage, qimage_to_pil
+from .trace import span, traced
+
+def rasterize(qrcode: segno.QRCode, size: int, dark: int = 0, light: int = 255) -> QImage:
+    rows, columns = len(qrcode.matrix), len(qrcode.matrix[0])
+    border: int = qrcode.default_border_size
+    
+    # every module gets the same whole number of pixels, the remainder widens the quiet zone
+    modules: int = max(rows, columns) + 2 * border
+    scale: int = max(size // modules, 1)
+    side: int = max(size, modules * scale)
+    
+    image: QImage = QImage(side, side, QImage.Format.Format_Grayscale8)
+    image.fill(light)
+    
+    # the modules are written straight into the pixel memory of the QImage, rows may be padded
+    pixels: np.ndarray = np.frombuffer(image.bits(), dtype=np.uint8).reshape(side, image.bytesPerLine())
+    matrix: np.ndarray = np.frombuffer(b"".join(qrcode.matrix), dtype=np.uint8).reshape(rows, columns)
+    
+    top: int = (side - rows * scale) // 2
+    left: int = (side - columns * scale) // 2
+    # splitting both axes gives a view with one block of scale x scale pixels per module,
+    # which the module values are broadcast into without an enlarged intermediate copy
+    blocks: np.ndarray = pixels[top:top + rows * scale, left:left + columns * scale].reshape(rows, scale, columns, scale)
+    blocks[...] = np.where(matrix, dark, light).astype(np.uint8)[:, None, :, None]
+    
+    return image
+
+def encode_png(image: QImage) -> bytes:
+    data: QByteArray = QByteArray()
+    buffer: QBuffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    buffer.close()
+    
+    return data.data()
+
+def decode_png(data: bytes) -> QImage | None:
+    image: QImage = QImage.fromData(data, "PNG")
+    
+    return None if image.isNull() else image
+
+# generated codes keyed by payload, generator options and background file identity
+cache: TieredCache = TieredCache(
+    LRUCache(max_bytes=64 * 2 ** 20, sizeof=lambda image: image.sizeInBytes()),
+    encode=encode_png,
+    decode=decode_png
+)
+
+def enable_disk_cache(directory: str, max_bytes: int = 256 * 2 ** 20) -> None:
+    cache.disk = DiskCache(directory, max_bytes=max_bytes, suffix=".png")
+
 class QRCodeGenerator(ABC):
-    def generate_qr_code(self):
+    def generate_qr_code(self) -> QImage:
         pass
     
+    def export(self, kind: str = "png") -> bytes:
+        if kind != "png":
+            raise ValueError(f"{type(self).__name__} can not export {kind}")
+            
+        return encode_png(self.generate_qr_code())
+
 class SegnoGenerator(QRCodeGenerator):
-    def __init__(self, input, input_image, input_image_text):
-        self.input = input
-        self.input_image = input_image
-        self.input_image_text = input_image_text
+    def __init__(self, text: str, background: str = None, size: int = 800):
+        self.text = text
+        self.background = background
+        self.size = size
+        
+    def key(self) -> str:
+        return content_key(type(self).__name__, self.text, self.size, file_identity(self.background))
     
-    def generate_qr_code(self) -> ImageQt:
-        qrcode = segno.make_qr(self.input.toPlainText())
-        if self.input_image:
-            import io
-            out = io.BytesIO()
-            text = self.input_image_text.text()
-
-            kind = text.split('.')[-1]
-            if kind == 'jpg':
-                kind = 'png'
+    @traced("generator.generate")
+    def generate_qr_code(self) -> QImage:
+        return cache.get_or_create(self.key(), self.render)
+        
+    def export(self, kind: str = "png") -> bytes:
+        if kind == "gif":
+            return self.export_gif()
+            
+        if kind != "svg":
+            return super().export(kind)
+            
+        if self.background:
+            raise ValueError("backgrounds can not be exported as svg")
             
-            qrcode.to_artistic(background=text, target=out, kind=kind)
-            pil_image = Image.open(out)
+        qrcode = segno.make_qr(self.text)
+        out = io.BytesIO()
+        # vector output, scaled so the nominal size matches the raster export
+        qrcode.save(out, kind="svg", scale=self.size / qrcode.symbol_size()[0])
         
+        return out.getvalue()
+        
+    @traced("generator.export_gif")
+    def export_gif(self) -> bytes:
+        if not self.background:
+            frames = iter([(qimage_to_pil(self.generate_qr_code()), 0)])
+            loop = 0
         else:
-            pil_image = qrcode.to_pil()
+            # the frames of an animated background are decoded, downscaled and composited one at a time
+            qrcode = segno.make_qr(self.text)
+            background = load_background(self.background, self.size)
+            frames = ((self.composite(qrcode, Background.to_stream(frame)), duration) for frame, duration in background.frames())
+            loop = background.loop
+            
+        def with_duration(frame: Image.Image, duration: int) -> Image.Image:
+            # the gif writer takes the delay of each frame from its info
+            frame.info["duration"] = duration
+            return frame
+            
+        first, rest = next(frames), (with_duration(frame, duration) for frame, duration in frames)
+        out = io.BytesIO()
+        with_duration(*first).save(out, format="GIF", save_all=True, append_images=rest, loop=loop)
         
-        pil_image = pil_image.resize((800, 800))
-        pil_image = pil_image.convert('RGB')
+        return out.getvalue()
         
-        image = ImageQt(pil_image)
+    def composite(self, qrcode: segno.QRCode, background: io.BytesIO) -> Image.Image:
+        out = io.BytesIO()
+        qrcode.to_artistic(background=background, target=out, kind='png')
+        pil_image = Image.open(out)
         
-        return image
\ No newline at end of file
+        pil_image = pil_image.resize((self.size, self.size))
+        return pil_image.convert('RGB')
+        
+    @traced("generator.render")
+    def render(self) -> QImage:
+        qrcode = segno.make_qr(self.text)
+        if self.background:
+            # decoded and downscaled once per file, the preview only needs the first frame
+            background = load_background(self.background, self.size)
+            
+            return pil_to_qimage(self.composite(qrcode, background.stream()))
+            
+        # plain codes skip PIL, the modules stay sharp at any size
+        return rasterize(qrcode, self.size)
@@ -1,10 +1,80 @@
+import threading
 from typing import List, Dict
 
-from PySide6.QtCore import QStandardPaths, QDir, QFileInfo
-from PySide6.QtWidgets import QPushButton, QFileDialog, QDialog, QMessageBox, QWidget
+from PySide6.QtCore import Qt, QObject, QStandardPaths, QDir, QFileInfo, QUrl, Signal
+from PySide6.QtWidgets import QPushButton, QFileDialog, QDialog, QMessageBox, QProgressDialog, QWidget
 from PySide6.QtGui import QImageWriter, QDesktopServices, QImage
 
-def save_image(parent: QWidget, image: QImage, msgs: Dict[str, str] = None) -> None:
+from .encoder import EncodeCancelled, encode_image
+from .worker import TaskRunner
+
+class ImageSaver(QObject):
+    # emitted from the worker thread with the number of bytes written so far
+    progress = Signal(int)
+    
+    def __init__(self, parent: QWidget, image: QImage, file_name: str, preset: str, msgs: Dict[str, str]) -> None:
+        super(ImageSaver, self).__init__(parent)
+        
+        self.parent_widget: QWidget = parent
+        self.file_name: str = file_name
+        self.msgs: Dict[str, str] = msgs
+        self.cancel: threading.Event = threading.Event()
+        
+        # the range stays open, the encoders can not tell how large the output will be
+        self.dialog: QProgressDialog = QProgressDialog(self.msgs.get("progress_text", "Saving image..."), "Cancel", 0, 0, parent)
+        self.dialog.setWindowTitle(self.msgs.get("save_title", "Save Image"))
+        self.dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.dialog.setMinimumDuration(300)
+        self.dialog.canceled.connect(self.cancel.set)
+        
+        self.progress.connect(self.update_progress)
+        
+        self.runner: TaskRunner = TaskRunner(max_workers=1, latest_only=False, parent=self)
+        self.runner.finished.connect(self.saved)
+        self.runner.failed.connect(self.failed)
+        self.runner.submit(encode_image, image, file_name, preset, self.progress.emit, self.cancel)
+        
+    def update_progress(self, written: int) -> None:
+        if not self.cancel.is_set():
+            self.dialog.setLabelText(f"{self.msgs.get('progress_text', 'Saving image...')} {written / 2 ** 20:.1f} MiB")
+            
+    def finish(self) -> None:
+        self.dialog.reset()
+        self.runner.shutdown()
+        self.deleteLater()
+        
+    def failed(self, generation: int, error: BaseException) -> None:
+        self.finish()
+        
+        if isinstance(error, EncodeCancelled):
+            return
+            
+        QMessageBox.warning(
+            self.parent_widget,
+            self.msgs.get("warning_title", "Save Error"),
+            f"{self.msgs.get('warning_text', 'The image could not be saved.')}\n{error}"
+        )
+        
+    def saved(self, generation: int, result: Dict) -> None:
+        self.finish()
+        
+        info = QFileInfo(self.file_name)
+        file_url: QUrl = QUrl.fromLocalFile(info.absoluteFilePath())
+        dir_url: QUrl = QUrl.fromLocalFile(info.absoluteDir().path())
+        
+        message_box: QMessageBox = QMessageBox(self.parent_widget)
+        message_box.setIcon(QMessageBox.Icon.Information)
+        message_box.setWindowTitle(self.msgs.get("save_title", "Save Image"))
+        message_box.setText(self.msgs.get("save_text", "The image has been saved."))
+        message_box.setInformativeText(f"{result['format']}, {result['bytes'] / 2 ** 20:.2f} MiB, encoded in {result['encode_ms']:.0f} ms")
+        button1: QPushButton = message_box.addButton(self.msgs.get("open_button_text", "Open Image"), QMessageBox.ButtonRole.ActionRole)
+        button1.clicked.connect(lambda: QDesktopServices.openUrl(file_url))
+        button2: QPushButton = message_box.addButton("Open Explorer", QMessageBox.ButtonRole.ActionRole)
+        button2.clicked.connect(lambda: QDesktopServices.openUrl(dir_url))
+        message_box.addButton(QMessageBox.StandardButton.Close)
+        message_box.show()
+
+def save_image(parent: QWidget, image: QImage, msgs: Dict[str, str] = None, preset: str = "balanced") -> ImageSaver | None:
     if not isinstance(msgs, dict):
         msgs = dict()
         
@@ -14,7 +84,7 @@ def save_image(parent: QWidget, image: QImage, msgs: Dict[str, str] = None) -> N
             msgs.get("information_title", "Save Image"),
             msgs.get("information_text", "There is no image to save.")
         )
-        return
+        return None
             
     file_format: str = "png"
     
@@ -34,32 +104,9 @@ def save_image(parent: QWidget, image: QImage, msgs: Dict[str, str] = None) -> N
     file_dialog.selectMimeTypeFilter("image/" + file_format)
     file_dialog.setDefaultSuffix(file_format)
     if file_dialog.exec() != QDialog.Accepted:
-        return
+        return None
     
     file_name: str = file_dialog.selectedFiles()[0]
     
-    saved: bool = image.save(file_name, quality=10)
-    path: str = QDir.toNativeSeparators(file_name)
-    
-    if not saved:
-        QMessageBox.warning(
-            parent,
-            msgs.get("warning_title", "Save Error"),
-            msgs.get("warning_text", "The image could not be saved.")
-        )
-        
-        return
-    
-    info = QFileInfo(file_name)
-    dir_path = info.absoluteDir().path()
-        
-    message_box: QMessageBox = QMessageBox()
-    message_box.setIcon(QMessageBox.Icon.Information)
-    message_box.setWindowTitle(msgs.get("save_title", "Save Image"))
-    message_box.setText(msgs.get("save_text", "The image has been saved."))
-    message_box.show()
-    button1: QPushButton = message_box.addButton(msgs.get("open_button_text", "Open Image"), QMessageBox.ButtonRole.ActionRole)
-    button1.clicked.connect(lambda: QDesktopServices.openUrl(file_name))
-    button2: QPushButton = message_box.addButton("Open Explorer", QMessageBox.ButtonRole.ActionRole)
-    button2.clicked.connect(lambda: QDesktopServices.openUrl(dir_path))
-    message_box.exec_()
\ No newline at end of file
+    # encoded on a worker thread, the dialog and the result box are driven by the saver
+    return ImageSaver(parent, image, file_name, preset, msgs)
@@ -0,0 +1,131 @@
+from typing import Dict, Tuple
+
+from PySide6.QtGui import QImage
+from PIL import Image
+import numpy as np
+
+# QImage formats which map 1:1 onto a uint8 numpy layout, with their channel count.
+# RGB32/ARGB32 are stored as 0xAARRGGBB words, i.e. BGRA bytes on little endian machines.
+CHANNELS: Dict[QImage.Format, int] = {
+    QImage.Format.Format_Grayscale8: 1,
+    QImage.Format.Format_RGB888: 3,
+    QImage.Format.Format_BGR888: 3,
+    QImage.Format.Format_RGB32: 4,
+    QImage.Format.Format_ARGB32: 4,
+    QImage.Format.Format_ARGB32_Premultiplied: 4,
+    QImage.Format.Format_RGBX8888: 4,
+    QImage.Format.Format_RGBA8888: 4,
+    QImage.Format.Format_RGBA8888_Premultiplied: 4,
+}
+
+# channel order of the bytes in memory, as understood by PIL raw modes
+BYTE_ORDER: Dict[QImage.Format, str] = {
+    QImage.Format.Format_Grayscale8: "L",
+    QImage.Format.Format_RGB888: "RGB",
+    QImage.Format.Format_BGR888: "BGR",
+    QImage.Format.Format_RGB32: "BGRX",
+    QImage.Format.Format_ARGB32: "BGRA",
+    QImage.Format.Format_RGBX8888: "RGBX",
+    QImage.Format.Format_RGBA8888: "RGBA",
+}
+
+class QImageBuffer():
+    # numpy keeps this object as the base of the view, which in turn keeps the
+    # QImage (and with it the pixel memory) alive for as long as the view exists
+    def __init__(self, image: QImage, shape: Tuple[int, ...], strides: Tuple[int, ...]) -> None:
+        self.image: QImage = image
+        buffer: np.ndarray = np.frombuffer(image.constBits(), dtype=np.uint8)
+        
+        self.__array_interface__ = {
+            "version": 3,
+            "typestr": "|u1",
+            "shape": shape,
+            "strides": strides,
+            "data": (buffer.ctypes.data, True),
+        }
+
+def qimage_to_array(image: QImage, copy: bool = False) -> np.ndarray:
+    if image.format() not in CHANNELS:
+        # the only conversion, every supported format below is a view
+        image = image.convertToFormat(QImage.Format.Format_RGB32)
+        
+    channels: int = CHANNELS[image.format()]
+    height, width, stride = image.height(), image.width(), image.bytesPerLine()
+    
+    if channels == 1:
+        shape, strides = (height, width), (stride, 1)
+    else:
+        shape, strides = (height, width, channels), (stride, channels, 1)
+        
+    array: np.ndarray = np.asarray(QImageBuffer(image, shape, strides))
+    
+    return array.copy() if copy else array
+
+def array_to_qimage(array: np.ndarray, channel_order: str = "RGB") -> QImage:
+    if array.dtype != np.uint8:
+        raise ValueError(f"unsupported dtype {array.dtype}, expected uint8")
+        
+    if array.ndim == 2:
+        image_format: QImage.Format = QImage.Format.Format_Grayscale8
+    elif array.shape[2] == 3:
+        image_format = QImage.Format.Format_RGB888 if channel_order == "RGB" else QImage.Format.Format_BGR888
+    elif array.shape[2] == 4:
+        image_format = QImage.Format.Format_RGBA8888 if channel_order == "RGB" else QImage.Format.Format_ARGB32
+    else:
+        raise ValueError(f"unsupported shape {array.shape}")
+        
+    # rows may be padded, but pixels inside a row have to be packed
+    if array.strides[-1] != 1 or (array.ndim == 3 and array.strides[1] != array.shape[2]):
+        array = np.ascontiguousarray(array)
+        
+    height, width = array.shape[:2]
+    
+    # QImage keeps a reference to the buffer, no copy of the pixels is made
+    return QImage(array.data, width, height, array.strides[0], image_format)
+
+def pil_to_qimage(image: Image.Image) -> QImage:
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        
+    # PIL does not expose its pixel memory, tobytes is the single unavoidable copy
+    formats: Dict[str, Tuple[QImage.Format, int]] = {
+        "L": (QImage.Format.Format_Grayscale8, 1),
+        "RGB": (QImage.Format.Format_RGB888, 3),
+        "RGBA": (QImage.Format.Format_RGBA8888, 4),
+    }
+    image_format, channels = formats[image.mode]
+    data: bytes = image.tobytes()
+    
+    return QImage(data, image.width, image.height, image.width * channels, image_format)
+
+def qimage_to_pil(image: QImage) -> Image.Image:
+    if image.format() not in BYTE_ORDER:
+        image = image.convertToFormat(QImage.Format.Format_RGB32)
+        
+    raw_mode: str = BYTE_ORDER[image.format()]
+    mode: str = {"L": "L", "RGB": "RGB", "BGR": "RGB", "BGRX": "RGB", "BGRA": "RGBA", "RGBX": "RGB", "RGBA": "RGBA"}[raw_mode]
+    
+    # PIL keeps a reference to the buffer, so matching layouts (L, RGBA) share the QImage
+    # memory and the others are unpacked in a single pass
+    size: int = image.bytesPerLine() * image.height()
+    buffer: np.ndarray = np.asarray(QImageBuffer(image, (size,), (1,)))
+    
+    return Image.frombuffer(mode, (image.width(), image.height()), buffer, "raw", raw_mode, image.bytesPerLine(), 1)
+
+def to_array(image: QImage | Image.Image | np.ndarray) -> np.ndarray:
+    if isinstance(image, QImage):
+        return qimage_to_array(image)
+        
+    if isinstance(image, Image.Image):
+        return np.asarray(image)
+        
+    return image
+
+def to_qimage(image: QImage | Image.Image | np.ndarray) -> QImage:
+    if isinstance(image, QImage):
+        return image
+        
+    if isinstance(image, Image.Image):
+        return pil_to_qimage(image)
+        
+    return array_to_qimage(image)
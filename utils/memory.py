@@ -0,0 +1,178 @@
+import os
+import sys
+import mmap
+import time
+import atexit
+import tempfile
+import threading
+import tracemalloc
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from PySide6.QtGui import QImage
+
+from . import trace
+
+# SNIPPINGPANDA_MEMORY=1 records the resident set size at checkpoints and prints them on exit,
+# SNIPPINGPANDA_MEMORY=tracemalloc also traces python and numpy allocations (slower)
+MEMORY_ENV: str = "SNIPPINGPANDA_MEMORY"
+
+MB: int = 2 ** 20
+
+def _process_memory() -> Tuple[int, int]:
+    import ctypes
+    from ctypes import wintypes
+    
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+        
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+    
+    return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+def rss() -> int:
+    if sys.platform == "win32":
+        return _process_memory()[0]
+        
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # without procfs only the peak is known
+        return peak_rss()
+
+def peak_rss() -> int:
+    if sys.platform == "win32":
+        return _process_memory()[1]
+        
+    import resource
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class MemoryMonitor():
+    def __init__(self, python: bool = False, frames: int = 1, max_checkpoints: int = 1000) -> None:
+        if python and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            
+        self.origin: float = time.perf_counter()
+        self.lock: threading.Lock = threading.Lock()
+        self.checkpoints: Deque[Dict] = deque(maxlen=max_checkpoints)
+        
+    def checkpoint(self, label: str) -> Dict:
+        entry: Dict = {
+            "label": label,
+            "seconds": round(time.perf_counter() - self.origin, 3),
+            "rss": rss(),
+            "peak_rss": peak_rss(),
+        }
+        if tracemalloc.is_tracing():
+            entry["python"], entry["python_peak"] = tracemalloc.get_traced_memory()
+            
+        with self.lock:
+            self.checkpoints.append(entry)
+            
+        # shown as a counter track next to the spans when tracing is enabled as well
+        trace.counter("memory", rss_mb=round(entry["rss"] / MB, 1))
+        
+        return entry
+        
+    def top(self, limit: int = 10) -> List[str]:
+        if not tracemalloc.is_tracing():
+            return []
+            
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        return [f"{stat.size / MB:10.1f} MB {stat.count:>8} blocks  {stat.traceback}" for stat in statistics[:limit]]
+        
+    def close(self) -> None:
+        # the steady state, after everything that is kept alive on purpose
+        self.checkpoint("exit")
+        
+        with self.lock:
+            checkpoints: List[Dict] = list(self.checkpoints)
+            
+        print(f"{'checkpoint':<32} {'seconds':>9} {'rss MB':>9} {'peak MB':>9} {'python MB':>10} {'py peak MB':>11}", file=sys.stderr)
+        for entry in checkpoints:
+            python: str = f"{entry['python'] / MB:>10.1f} {entry['python_peak'] / MB:>11.1f}" if "python" in entry else f"{'-':>10} {'-':>11}"
+            print(f"{entry['label']:<32} {entry['seconds']:>9.3f} {entry['rss'] / MB:>9.1f} {entry['peak_rss'] / MB:>9.1f} {python}", file=sys.stderr)
+            
+        for line in self.top():
+            print(line, file=sys.stderr)
+
+def from_environment() -> MemoryMonitor | None:
+    value: str = os.environ.get(MEMORY_ENV, "")
+    if value in ("", "0"):
+        return None
+        
+    memory_monitor: MemoryMonitor = MemoryMonitor(python=value == "tracemalloc")
+    atexit.register(memory_monitor.close)
+    return memory_monitor
+
+monitor: MemoryMonitor | None = from_environment()
+
+def checkpoint(label: str) -> Dict | None:
+    if monitor is None:
+        return None
+        
+    return monitor.checkpoint(label)
+
+class SpillableImage():
+    # the single owner of a large image. While it is not used, the pixels are written to a temp
+    # file once and the in-memory copy is dropped; using it again maps the file, so the OS pages
+    # in what is drawn and can drop those pages again under memory pressure.
+    def __init__(self, image: QImage, directory: str = None) -> None:
+        self._image: QImage = image
+        self._file = None
+        self.directory: str = directory
+        
+        self.width: int = image.width()
+        self.height: int = image.height()
+        self.format: QImage.Format = image.format()
+        self.stride: int = image.bytesPerLine()
+        self.nbytes: int = image.sizeInBytes()
+        
+    @property
+    def spilled(self) -> bool:
+        return self._image is None
+        
+    def get(self) -> QImage:
+        if self._image is None:
+            # Qt paints straight into the buffer it is given, so the mapping must be writable. Writes go
+            # through to the temp file, which keeps it valid for the next spill.
+            mapped: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE)
+            self._image = QImage(memoryview(mapped), self.width, self.height, self.stride, self.format)
+            
+        return self._image
+        
+    def spill(self) -> None:
+        if self._image is None or self.nbytes == 0:
+            return
+            
+        # a file written before is still valid, painting on the mapped image wrote through to it
+        if self._file is None:
+            file = tempfile.TemporaryFile(prefix="snippingpanda-", dir=self.directory)
+            file.write(self._image.constBits())
+            file.flush()
+            self._file = file
+            
+        self._image = None
+        
+    def close(self) -> None:
+        self._image = None
+        if self._file is not None:
+            # an image that is still mapped somewhere keeps its own handle to the file
+            self._file.close()
+            self._file = None
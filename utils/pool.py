@@ -0,0 +1,39 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Callable, Iterable, Iterator, List, Set, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+def iter_chunks(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    chunk: List[T] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+            
+    if chunk:
+        yield chunk
+        
+def imap_bounded(executor: Executor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    # like executor.map, but the input is consumed lazily and at most `window` tasks
+    # are in flight, so memory stays flat for inputs of any length. Results are
+    # yielded in completion order.
+    items = iter(items)
+    pending: Set[Future] = set()
+    
+    def fill() -> None:
+        while len(pending) < window:
+            item = next(items, _DONE)
+            if item is _DONE:
+                return
+            pending.add(executor.submit(fn, item))
+            
+    fill()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+        fill()
@@ -0,0 +1,137 @@
+from typing import List
+
+from PySide6.QtCore import Qt, QSize, QTimer
+from PySide6.QtGui import QGuiApplication, QImage, QPixmap, QResizeEvent
+from PySide6.QtWidgets import QLabel, QWidget
+
+from .trace import span
+from .worker import TaskRunner
+
+class PreviewPyramid():
+    # the image halved again and again, so any preview size is scaled from a level that is
+    # at most twice as large instead of from the full resolution original
+    def __init__(self, image: QImage, max_size: QSize = QSize(2048, 2048), min_side: int = 128) -> None:
+        self.width: int = image.width()
+        self.height: int = image.height()
+        self.levels: List[QImage] = []
+        
+        # the first level is the original fitted into max_size, scaled in one pass since Qt averages all
+        # covered pixels when it shrinks. It never shares the pixels of the original, which must be
+        # free to be spilled once it is not used; a small original is copied.
+        level: QImage
+        if self.width <= max_size.width() and self.height <= max_size.height():
+            level = image.copy()
+        else:
+            level = image.scaled(max_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        self.levels.append(level)
+        
+        while min(level.width(), level.height()) >= 2 * min_side:
+            level = self.halve(level)
+            self.levels.append(level)
+            
+    @staticmethod
+    def halve(image: QImage) -> QImage:
+        # a 2:1 smooth scale averages neighbouring pixels, repeated it approximates a box filter
+        return image.scaled(max(image.width() // 2, 1), max(image.height() // 2, 1), Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        
+    @property
+    def nbytes(self) -> int:
+        return sum(level.sizeInBytes() for level in self.levels)
+        
+    def level(self, size: QSize) -> QImage:
+        target: QSize = QSize(self.width, self.height).scaled(size, Qt.AspectRatioMode.KeepAspectRatio)
+        
+        # the smallest level that still covers the target, or the largest one when upscaling
+        for level in reversed(self.levels):
+            if level.width() >= target.width() and level.height() >= target.height():
+                return level
+                
+        return self.levels[0]
+        
+    def render(self, size: QSize) -> QImage:
+        with span("preview.render", width=size.width(), height=size.height()):
+            return self.level(size).scaled(size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+class PreviewLabel(QLabel):
+    # images up to this many pixels are scaled on the GUI thread, larger ones build their pyramid in the background
+    SYNC_PIXELS: int = 2 ** 20
+    
+    def __init__(self, parent: QWidget = None) -> None:
+        super(PreviewLabel, self).__init__(parent)
+        
+        self.pyramid: PreviewPyramid = None
+        self._image: QImage = None
+        
+        self.runner: TaskRunner = TaskRunner(max_workers=1, parent=self)
+        self.runner.finished.connect(self.pyramid_built)
+        
+        # a drag of the window edge sends a resize event per frame, the preview follows once it settles
+        self.resize_timer: QTimer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(30)
+        self.resize_timer.timeout.connect(self.render)
+        
+    def minimumSizeHint(self) -> QSize:
+        # the pixmap follows the label, it must not keep the label from shrinking
+        return QSize(1, 1)
+        
+    def target_size(self) -> QSize:
+        # in device pixels, so the preview stays sharp on scaled screens
+        return self.size() * self.devicePixelRatioF()
+        
+    def max_size(self) -> QSize:
+        # the largest the label gets in device pixels, with its window maximized on any screen. The
+        # largest level covers it, a 4k capture on a 2x screen is not upscaled from a smaller level,
+        # and a full screen capture is still never kept at full size.
+        chrome: QSize = (self.window().size() - self.size()).expandedTo(QSize(0, 0))
+        size: QSize = QSize(0, 0)
+        for screen in QGuiApplication.screens():
+            size = size.expandedTo((screen.availableSize() - chrome) * screen.devicePixelRatio())
+            
+        return size if not size.isEmpty() else QSize(2048, 2048)
+        
+    def set_image(self, image: QImage) -> None:
+        if image.width() * image.height() <= self.SYNC_PIXELS:
+            self.runner.cancel()
+            self._image = None
+            self.pyramid = PreviewPyramid(image, self.max_size())
+            self.render()
+            return
+            
+        # a nearest neighbour preview only reads the pixels it shows, until the pyramid is ready
+        self.pyramid = None
+        self._image = image
+        self.show_pixmap(image.scaled(self.target_size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation))
+        
+        self.runner.submit(PreviewPyramid, image, self.max_size())
+        
+    def pyramid_built(self, generation: int, pyramid: PreviewPyramid) -> None:
+        # the original is not held any longer than the pyramid takes to build
+        self._image = None
+        self.pyramid = pyramid
+        self.render()
+        
+    def render(self) -> None:
+        if self.pyramid is None:
+            if self._image is not None:
+                self.show_pixmap(self._image.scaled(self.target_size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation))
+            return
+            
+        self.show_pixmap(self.pyramid.render(self.target_size()))
+        
+    def show_pixmap(self, image: QImage) -> None:
+        pixmap: QPixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+        self.setPixmap(pixmap)
+        
+    def clear_image(self, text: str = "") -> None:
+        self.runner.cancel()
+        self.pyramid = None
+        self._image = None
+        self.setText(text)
+        
+    def resizeEvent(self, event: QResizeEvent) -> None:
+        super(PreviewLabel, self).resizeEvent(event)
+        
+        if self.pyramid is not None or self._image is not None:
+            self.resize_timer.start()
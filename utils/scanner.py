@@ -0,0 +1,140 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+import cv2
+import numpy as np
+
+from .decoder import Box, OpenCVDecoder, QRCodeDecoder
+
+Region = Tuple[int, int, int, int]
+
+class TiledScanner():
+    def __init__(
+        self,
+        decoder_factory: Callable[[], QRCodeDecoder] = OpenCVDecoder,
+        tile_size: int = 1024,
+        overlap: int = 256,
+        detect_size: int = 1600,
+        workers: int = None
+    ) -> None:
+        self.decoder_factory: Callable[[], QRCodeDecoder] = decoder_factory
+        self.tile_size: int = tile_size
+        # codes up to this size are always fully contained in at least one tile,
+        # larger ones are found by the downscaled detection pass
+        self.overlap: int = overlap
+        self.detect_size: int = detect_size
+        self.workers: int = workers or os.cpu_count() or 1
+        
+        self._local: threading.local = threading.local()
+        # kept across scans, the detectors of its threads load their models only once
+        self.executor: ThreadPoolExecutor = None
+        
+    def _decoder(self) -> QRCodeDecoder:
+        # detectors are not thread safe, every worker thread keeps its own
+        decoder: QRCodeDecoder = getattr(self._local, "decoder", None)
+        if decoder is None:
+            decoder = self._local.decoder = self.decoder_factory()
+            
+        return decoder
+        
+    def _detector(self) -> cv2.QRCodeDetectorAruco:
+        # the aruco based detector locates codes far more reliably on downscaled frames
+        detector: cv2.QRCodeDetectorAruco = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = cv2.QRCodeDetectorAruco()
+            
+        return detector
+        
+    def _axis(self, length: int) -> List[int]:
+        if length <= self.tile_size:
+            return [0]
+            
+        stride: int = self.tile_size - self.overlap
+        starts: List[int] = list(range(0, length - self.tile_size, stride))
+        starts.append(length - self.tile_size)
+        
+        return starts
+        
+    def tiles(self, width: int, height: int) -> List[Region]:
+        return [
+            (x, y, min(self.tile_size, width), min(self.tile_size, height))
+            for y in self._axis(height)
+            for x in self._axis(width)
+        ]
+        
+    def candidates(self, gray: np.ndarray) -> List[Region]:
+        height, width = gray.shape[:2]
+        scale: float = self.detect_size / max(width, height)
+        if scale >= 1:
+            return []
+            
+        small: np.ndarray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        found, points = self._detector().detectMulti(small)
+        if not found or points is None:
+            return []
+            
+        regions: List[Region] = []
+        for quad in points / scale:
+            x1, y1 = quad.min(axis=0)
+            x2, y2 = quad.max(axis=0)
+            
+            # the quiet zone is needed for decoding, so the region is grown generously
+            margin: float = max(x2 - x1, y2 - y1) * 0.25 + 8
+            x1, y1 = max(int(x1 - margin), 0), max(int(y1 - margin), 0)
+            x2, y2 = min(int(x2 + margin), width), min(int(y2 + margin), height)
+            
+            regions.append((x1, y1, x2 - x1, y2 - y1))
+            
+        return regions
+        
+    def decode_region(self, gray: np.ndarray, region: Region) -> Tuple[List[str], List[Box]]:
+        x, y, w, h = region
+        texts, boxes = self._decoder().decode(gray[y:y + h, x:x + w])
+        
+        return texts, [[(px + x, py + y) for px, py in box] for box in boxes]
+        
+    def scan(self, image: np.ndarray) -> Tuple[List[str], List[Box]]:
+        if image.ndim == 3:
+            code: int = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            gray: np.ndarray = cv2.cvtColor(image, code)
+        else:
+            gray = image
+            
+        height, width = gray.shape[:2]
+        regions: List[Region] = self.candidates(gray) + self.tiles(width, height)
+        
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scanner")
+        results = list(self.executor.map(lambda region: self.decode_region(gray, region), regions))
+            
+        texts: List[str] = []
+        boxes: List[Box] = []
+        for region_texts, region_boxes in results:
+            for text, box in zip(region_texts, region_boxes):
+                if not text or self._is_duplicate(text, box, texts, boxes):
+                    continue
+                    
+                texts.append(text)
+                boxes.append(box)
+                
+        # reading order, top to bottom and left to right
+        order: List[int] = sorted(range(len(boxes)), key=lambda i: (min(p[1] for p in boxes[i]), min(p[0] for p in boxes[i])))
+        
+        return [texts[i] for i in order], [boxes[i] for i in order]
+        
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            
+    def _is_duplicate(self, text: str, box: Box, texts: List[str], boxes: List[Box]) -> bool:
+        center: np.ndarray = np.mean(box, axis=0)
+        size: float = np.ptp(np.array(box), axis=0).max()
+        
+        for other_text, other_box in zip(texts, boxes):
+            if other_text == text and np.linalg.norm(np.mean(other_box, axis=0) - center) < size / 2:
+                return True
+                
+        return False
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, ContextManager, Deque, Dict, List, Iterator
+
+# SNIPPINGPANDA_TRACE=trace.json records spans and writes them as chrome trace events
+# (chrome://tracing, ui.perfetto.dev) on exit, SNIPPINGPANDA_TRACE=1 only keeps the summary
+TRACE_ENV: str = "SNIPPINGPANDA_TRACE"
+
+def percentile(values: List[float], q: float) -> float:
+    # nearest rank on sorted values
+    return values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))]
+
+class Tracer():
+    def __init__(self, path: str = None, max_events: int = 100_000, window: int = 256) -> None:
+        self.path: str = path
+        self.pid: int = os.getpid()
+        self.origin: float = time.perf_counter()
+        
+        self.lock: threading.Lock = threading.Lock()
+        # oldest events are dropped first, a long session can not grow the trace without bound
+        self.events: Deque[Dict] = deque(maxlen=max_events)
+        # the summary only covers the latest spans of every name
+        self.durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.threads: Dict[int, str] = {}
+        
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), args)
+            
+    def record(self, name: str, start: float, end: float, args: Dict = None) -> None:
+        tid: int = threading.get_ident()
+        event: Dict = {
+            "name": name,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": self.pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+            
+        with self.lock:
+            self.events.append(event)
+            self.durations[name].append(end - start)
+            self.counts[name] += 1
+            if tid not in self.threads:
+                self.threads[tid] = threading.current_thread().name
+                
+    def counter(self, name: str, **values) -> None:
+        event: Dict = {
+            "name": name,
+            "ph": "C",
+            "ts": round((time.perf_counter() - self.origin) * 1e6, 1),
+            "pid": self.pid,
+            "args": values,
+        }
+        with self.lock:
+            self.events.append(event)
+            
+    def summary(self) -> Dict[str, Dict]:
+        with self.lock:
+            durations: Dict[str, List[float]] = {name: sorted(values) for name, values in self.durations.items()}
+            counts: Dict[str, int] = dict(self.counts)
+            
+        return {
+            name: {
+                "count": counts[name],
+                "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+            for name, values in sorted(durations.items())
+        }
+        
+    def export(self, path: str = None) -> str:
+        path = path or self.path
+        with self.lock:
+            events: List[Dict] = list(self.events)
+            threads: Dict[int, str] = dict(self.threads)
+            
+        names: List[Dict] = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        
+        with open(path, "w", encoding="utf8") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms", "otherData": {"summary": self.summary()}}, f)
+            
+        return path
+        
+    def close(self) -> None:
+        if self.path:
+            try:
+                self.export()
+            except OSError as error:
+                print(f"could not write trace to {self.path}: {error}", file=sys.stderr)
+                
+        summary: Dict[str, Dict] = self.summary()
+        if not summary:
+            return
+            
+        print(f"{'span':<32} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}", file=sys.stderr)
+        for name, stats in summary.items():
+            print(f"{name:<32} {stats['count']:>7} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['max_ms']:>10.3f}", file=sys.stderr)
+
+def from_environment() -> Tracer | None:
+    value: str = os.environ.get(TRACE_ENV, "")
+    if value in ("", "0"):
+        return None
+        
+    tracer: Tracer = Tracer(None if value == "1" else os.path.abspath(value))
+    atexit.register(tracer.close)
+    return tracer
+
+tracer: Tracer | None = from_environment()
+
+# shared by every disabled span, entering it does nothing
+_DISABLED: ContextManager = nullcontext()
+
+def span(name: str, **args) -> ContextManager:
+    if tracer is None:
+        return _DISABLED
+        
+    return tracer.span(name, **args)
+
+def traced(name: str = None) -> Callable[[Callable], Callable]:
+    def decorate(fn: Callable) -> Callable:
+        # without tracing the function is returned as is, calls pay nothing
+        if tracer is None:
+            return fn
+            
+        label: str = name or fn.__qualname__
+        
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(label):
+                return fn(*args, **kwargs)
+                
+        return wrapper
+    return decorate
+
+def record(name: str, start: float, end: float, **args) -> None:
+    # for work that does not fit a with block, such as a task that finishes in a later event
+    if tracer is not None:
+        tracer.record(name, start, end, args)
+
+def counter(name: str, **values) -> None:
+    if tracer is not None:
+        tracer.counter(name, **values)
+
+def summary() -> Dict[str, Dict]:
+    return tracer.summary() if tracer is not None else {}
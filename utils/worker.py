@@ -0,0 +1,259 @@
+import os
+import multiprocessing
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Callable, List, Set, Tuple
+
+from PySide6.QtCore import QObject, Signal
+
+class TaskRunner(QObject):
+    finished = Signal(int, object)
+    failed = Signal(int, object)
+    
+    # emitted from the worker thread, delivered queued on the thread owning the runner
+    _done = Signal(int, object)
+    
+    def __init__(self, max_workers: int = 1, latest_only: bool = True, parent: QObject = None) -> None:
+        super(TaskRunner, self).__init__(parent)
+        
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers)
+        self.latest_only: bool = latest_only
+        self.generation: int = 0
+        self.pending: int = 0
+        self._futures: Set[Future] = set()
+        
+        self._done.connect(self._deliver)
+        
+    @property
+    def busy(self) -> bool:
+        return self.pending > 0
+        
+    def submit(self, fn: Callable, *args, **kwargs) -> int:
+        self.generation += 1
+        generation: int = self.generation
+        
+        # queued tasks that did not start yet are superseded and never run
+        if self.latest_only:
+            for future in list(self._futures):
+                future.cancel()
+                
+        self.pending += 1
+        future: Future = self.executor.submit(fn, *args, **kwargs)
+        self._futures.add(future)
+        future.add_done_callback(lambda f: self._done.emit(generation, f))
+        
+        return generation
+        
+    def _deliver(self, generation: int, future: Future) -> None:
+        self.pending -= 1
+        self._futures.discard(future)
+        
+        # results of superseded tasks are dropped
+        if future.cancelled() or (self.latest_only and generation != self.generation):
+            return
+            
+        error: BaseException = future.exception()
+        if error is not None:
+            self.failed.emit(generation, error)
+            return
+            
+        self.finished.emit(generation, future.result())
+        
+    def cancel(self) -> None:
+        # queued tasks never run and the results of running ones are dropped
+        self.generation += 1
+        for future in list(self._futures):
+            future.cancel()
+            
+    def shutdown(self) -> None:
+        self.generation += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+READY: str = "ready"
+
+def serve(connection: Connection, initializer: Callable | None, initargs: Tuple) -> None:
+    # the loop of an isolated worker process, one task at a time until the pipe is closed
+    if hasattr(os, "nice"):
+        # below the UI, so a long task does not take the CPU from painting on busy machines
+        os.nice(5)
+        
+    if initializer is not None:
+        initializer(*initargs)
+        
+    # the parent starts the timeout of a task only from here, start-up and imports are not part of it
+    try:
+        connection.send(READY)
+    except OSError:
+        return
+        
+    while True:
+        try:
+            fn, args, kwargs = connection.recv()
+        except (EOFError, OSError):
+            return
+            
+        try:
+            reply: Tuple = (fn(*args, **kwargs), None)
+        except Exception as e:
+            reply = (None, e)
+            
+        try:
+            connection.send(reply)
+        except OSError:
+            return
+        except Exception as e:
+            # the reply is pickled before anything is written, so the pipe is still usable
+            connection.send((None, RuntimeError(repr(reply[1]) if reply[1] is not None else f"the result could not be sent back: {e}")))
+
+class IsolatedWorker():
+    def __init__(self, context: multiprocessing.context.BaseContext, initializer: Callable = None, initargs: Tuple = ()) -> None:
+        self.connection, child = context.Pipe()
+        self.process: multiprocessing.Process = context.Process(target=serve, args=(child, initializer, initargs), daemon=True)
+        self.process.start()
+        # only the child holds its end, so the parent reads end of file once the child is gone
+        child.close()
+        
+        # set once the ready message was read, by the thread that waits for the first task
+        self.ready: bool = False
+        self.killed: bool = False
+        self.closed: bool = False
+        
+    def kill(self) -> None:
+        self.killed = True
+        if self.process.is_alive():
+            self.process.kill()
+            
+    def close(self) -> None:
+        if self.closed:
+            return
+            
+        self.closed = True
+        self.kill()
+        self.connection.close()
+        self.process.join(1)
+
+class IsolatedRunner(QObject):
+    # like TaskRunner, but tasks run in a separate process, which is killed when a task takes longer
+    # than `timeout` seconds or when a newer task is submitted. A spare process is kept started
+    # while a task runs, so a superseding task does not wait for the interpreter and its imports.
+    finished = Signal(int, object)
+    failed = Signal(int, object)
+    
+    # emitted from the waiting thread with the generation, the worker and the result or error
+    _done = Signal(int, object, object, object)
+    
+    # idle workers that are kept, the one that ran the last task and the spare started meanwhile
+    MAX_IDLE: int = 2
+    
+    def __init__(self, timeout: float = 10.0, initializer: Callable = None, initargs: Tuple = (), startup_timeout: float = 60.0, parent: QObject = None) -> None:
+        super(IsolatedRunner, self).__init__(parent)
+        
+        self.timeout: float = timeout
+        # for a worker to become ready, generous as a frozen build starts slowly on a cold disk
+        self.startup_timeout: float = startup_timeout
+        self.initializer: Callable = initializer
+        self.initargs: Tuple = initargs
+        # a forked child would inherit the locks of Qt's threads in whatever state they were in
+        self.context: multiprocessing.context.BaseContext = multiprocessing.get_context("spawn")
+        
+        self.generation: int = 0
+        self._running: IsolatedWorker = None
+        # the most recently used last, it has the warmest caches
+        self._idle: List[IsolatedWorker] = []
+        self._stopped: bool = False
+        
+        self._done.connect(self._deliver)
+        self.warm_up()
+        
+    @property
+    def busy(self) -> bool:
+        return self._running is not None
+        
+    def warm_up(self) -> None:
+        if not self._idle and not self._stopped:
+            self._idle.append(IsolatedWorker(self.context, self.initializer, self.initargs))
+            
+    def submit(self, fn: Callable, *args, **kwargs) -> int:
+        self.generation += 1
+        generation: int = self.generation
+        
+        # a superseded task is not waited for, its process is killed and a spare takes over
+        self.cancel_running()
+        self.warm_up()
+        worker: IsolatedWorker = self._idle.pop()
+        self._running = worker
+        # the next spare starts while the task runs, not when a newer task already waits for it
+        self.warm_up()
+        
+        threading.Thread(target=self._wait, args=(generation, worker, fn, args, kwargs), name="isolated-runner", daemon=True).start()
+        
+        return generation
+        
+    def _wait(self, generation: int, worker: IsolatedWorker, fn: Callable, args: Tuple, kwargs: dict) -> None:
+        # large arguments are pickled and written here, not on the GUI thread
+        result, error = None, None
+        try:
+            if not worker.ready and not worker.connection.poll(self.startup_timeout):
+                worker.kill()
+                error = TimeoutError(f"the worker process was not ready after {self.startup_timeout:g} s")
+            else:
+                if not worker.ready:
+                    worker.connection.recv()
+                    worker.ready = True
+                    
+                worker.connection.send((fn, args, kwargs))
+                if worker.connection.poll(self.timeout):
+                    result, error = worker.connection.recv()
+                else:
+                    worker.kill()
+                    error = TimeoutError(f"no result after {self.timeout:g} s")
+        except (EOFError, OSError):
+            worker.kill()
+            worker.process.join(1)
+            error = ChildProcessError(f"the worker process exited with code {worker.process.exitcode}")
+            
+        self._done.emit(generation, worker, result, error)
+        
+    def cancel_running(self) -> None:
+        if self._running is not None:
+            self._running.kill()
+            self._running = None
+            
+    def cancel(self) -> None:
+        self.generation += 1
+        self.cancel_running()
+        
+    def _deliver(self, generation: int, worker: IsolatedWorker, result: object, error: BaseException) -> None:
+        if worker is not self._running:
+            # killed on cancellation, the result is dropped
+            worker.close()
+            return
+            
+        self._running = None
+        if worker.killed or len(self._idle) >= self.MAX_IDLE:
+            worker.close()
+        else:
+            self._idle.append(worker)
+        # a killed worker is replaced right away, not when the next task arrives
+        self.warm_up()
+        
+        if generation != self.generation:
+            return
+            
+        if error is not None:
+            self.failed.emit(generation, error)
+            return
+            
+        self.finished.emit(generation, result)
+        
+    def shutdown(self) -> None:
+        self.generation += 1
+        self._stopped = True
+        
+        for worker in [self._running, *self._idle]:
+            if worker is not None:
+                worker.close()
+                
+        self._running = None
+        self._idle = []